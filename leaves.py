@@ -1,16 +1,15 @@
 # BEGIN OUTLINE
 """
-TODO :
-- Save game using game notation?
-- Connected areas count?
+This script contains the `Game` class implementing the rules and state of Leaves.
 """
 # END   OUTLINE
 
 
 # BEGIN IMPORTS
 
-from collections import Counter # Counting how many pieces of each player present
 from enum import Enum # Direction ADT
+from functools import cache # Memoizing hash keys
+from leaves_instrument import instrumented # Opt-in profiling of hot paths
 
 # END   IMPORTS
 
@@ -19,6 +18,20 @@ from enum import Enum # Direction ADT
 
 # Directions
 
+# Board tiles are stored as one byte: 0 for empty, piece id + 2 otherwise
+_LOG = 1 # Log pieces have id = -1
+
+MAX_PLAYERS = 256 - 2
+"""Most players a game can have (player ids must fit into a board tile byte)."""
+
+# Board keys are sums of piece keys (code key) * X^x * Y^y modulo a prime,
+# so moving all pieces by (dx,dy) multiplies the key by X^dx * Y^dy
+_KEY_MODULUS = (1 << 61) - 1
+_KEY_BASE_X = 0x0F3D5B79A2C4E681
+_KEY_BASE_Y = 0x1B7E151628AED2A7
+
+_AREA_SEARCH_LIMIT = 64 # Tiles searched around each part of an area that may have split off before searching it whole
+
 # END   CONSTANTS
 
 
@@ -35,73 +48,558 @@ class Dir(Enum):
     SOUTH = 2
     WEST  = 3
 
+class _Regions:
+    """Connected areas of equal pieces on a board, kept in a union-find over grid indices.
+
+    Every occupied tile has a node; when a tile changes, its old node stays in
+    the forest as a ghost (so paths through it remain valid) and a new node is
+    made. Roots store the size of their area and how many of its tiles are
+    attached to logs. The number of (attached) areas and the roots of every
+    piece code are kept up to date, so counts can be read in constant time and
+    sizes without visiting single tiles. Union-find cannot
+    split sets, so when removed tiles leave parts of an area that may no longer
+    be connected, a search from those parts finds out whether the area really
+    fell apart, and only the pieces that split off get new nodes.
+    """
+    __slots__ = ('_node_at', '_parent', '_size', '_attached', '_code', '_roots', '_area_counts', '_attached_area_counts')
+
+    def __init__(self, board):
+        self.rebuild(board)
+
+    def rebuild(self, board):
+        """Recompute all areas of a board from scratch."""
+        (self._node_at, self._parent, self._size, self._attached, self._code) = (dict(), [], [], [], [])
+        (self._roots, self._area_counts, self._attached_area_counts) = (dict(), dict(), dict())
+        (cells,s) = (board._cells, board._stride)
+        indices = [ i for y in range(board._height)
+                    for i in range(board._index(0,y), board._index(board._width,y))
+                    if cells[i] ]
+        for i in indices:
+            self._add(i, cells[i], board._is_attached(i))
+        for i in indices:
+            for j in (i-1, i-s):
+                if cells[j] == cells[i]:
+                    self._union(self._node_at[i], self._node_at[j])
+        return
+
+    def _find(self, node):
+        """Root of a node, compressing the path to it."""
+        parent = self._parent
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            (parent[node], node) = (root, parent[node])
+        return root
+
+    def _new_area(self, tiles, code, attached):
+        """Make one new area of some tiles, given how many of them are attached."""
+        root = len(self._parent)
+        for (k,i) in enumerate(tiles):
+            self._node_at[i] = root + k
+        self._parent.extend([root] * len(tiles))
+        self._size.extend([len(tiles)] + [0] * (len(tiles) - 1))
+        self._attached.extend([attached] + [0] * (len(tiles) - 1))
+        self._code.extend([code] * len(tiles))
+        self._roots.setdefault(code, set()).add(root)
+        self._area_counts[code] = self._area_counts.get(code, 0) + 1
+        if attached:
+            self._attached_area_counts[code] = self._attached_area_counts.get(code, 0) + 1
+        return
+
+    def _add(self, i, code, attached):
+        """Make a new single-tile area for a tile."""
+        node = len(self._parent)
+        self._node_at[i] = node
+        self._parent.append(node)
+        self._size.append(1)
+        self._attached.append(int(attached))
+        self._code.append(code)
+        self._roots.setdefault(code, set()).add(node)
+        self._area_counts[code] = self._area_counts.get(code, 0) + 1
+        if attached:
+            self._attached_area_counts[code] = self._attached_area_counts.get(code, 0) + 1
+        return
+
+    def _union(self, a, b):
+        """Merge the areas of two nodes of equal code."""
+        (a,b) = (self._find(a), self._find(b))
+        if a == b:
+            return
+        if self._size[a] < self._size[b]:
+            (a,b) = (b,a)
+        code = self._code[a]
+        self._parent[b] = a
+        self._size[a] += self._size[b]
+        self._roots[code].discard(b)
+        self._area_counts[code] -= 1
+        if self._attached[a] and self._attached[b]:
+            self._attached_area_counts[code] -= 1
+        self._attached[a] += self._attached[b]
+        return
+
+    def _set_attached(self, i, change):
+        """Count a tile of an area as (no longer) attached."""
+        self._shrink(self._find(self._node_at[i]), 0, -change)
+        return
+
+    def _shrink(self, root, size, attached):
+        """Take some tiles, of which some are attached, out of an area."""
+        code = self._code[root]
+        was_attached = self._attached[root] > 0
+        self._size[root] -= size
+        self._attached[root] -= attached
+        if was_attached != (self._attached[root] > 0):
+            self._attached_area_counts[code] = self._attached_area_counts.get(code, 0) + (-1 if was_attached else 1)
+        if size and not self._size[root]:
+            self._roots[code].discard(root)
+            self._area_counts[code] -= 1
+        return
+
+    def _drop(self, i, attached):
+        """Remove a tile from its area (its node stays as ghost)."""
+        self._shrink(self._find(self._node_at.pop(i)), 1, int(attached))
+        return
+
+    def _flood(self, board, start, code, limit=None):
+        """Tiles of an area reachable from a tile, and whether all were found before `limit` tiles were."""
+        (cells,s,node_at) = (board._cells, board._stride, self._node_at)
+        tiles = {start}
+        stack = [start]
+        while stack:
+            if limit is not None and len(tiles) > limit:
+                return (tiles, False)
+            i = stack.pop()
+            for j in (i+1, i-1, i+s, i-s):
+                if cells[j] == code and j not in tiles and j in node_at:
+                    tiles.add(j)
+                    stack.append(j)
+        return (tiles, True)
+
+    def _split_off(self, board, root, tiles):
+        """Give some tiles that are no longer connected to the rest of their area an area of their own."""
+        attached = sum(board._is_attached(i) for i in tiles)
+        self._shrink(root, len(tiles), attached)
+        self._new_area(list(tiles), self._code[root], attached)
+        return
+
+    def _split(self, board, root, seeds):
+        """Find out whether the remaining tiles next to removed ones of an area are still connected, splitting off the parts that are not."""
+        code = self._code[root]
+        (pending,large) = (set(seeds), [])
+        # Search around every part with a small budget, so small parts splitting off stay cheap to find
+        while pending:
+            (tiles,complete) = self._flood(board, pending.pop(), code, _AREA_SEARCH_LIMIT)
+            pending -= tiles
+            if complete:
+                # The last part found stays with the area itself
+                if pending or large:
+                    self._split_off(board, root, tiles)
+            else:
+                for other in large:
+                    if not other.isdisjoint(tiles):
+                        other |= tiles
+                        break
+                else:
+                    large.append(tiles)
+        # Large parts may still be connected beyond what was searched
+        if len(large) > 1:
+            (kept,_) = self._flood(board, next(iter(large[0])), code)
+            for other in large[1:]:
+                if other.isdisjoint(kept):
+                    (tiles,_) = self._flood(board, next(iter(other)), code)
+                    self._split_off(board, root, tiles)
+                    kept |= tiles
+        return
+
+    def update(self, board, before):
+        """Update the areas after some tiles changed, given their (grid index, code, attached) from before."""
+        (cells,s) = (board._cells, board._stride)
+        changed = []
+        for (i,old_code,old_attached) in before:
+            new_code = cells[i]
+            new_attached = bool(new_code) and board._is_attached(i)
+            if new_code == old_code:
+                if new_code and old_attached != new_attached:
+                    self._set_attached(i, 1 if new_attached else -1)
+                continue
+            changed.append((i,old_code,old_attached,new_code,new_attached))
+        # Remove old tiles, noting which tiles of their areas were next to them
+        neighbors = dict() # Root of an area -> tiles that were next to its removed tiles
+        for (i,old_code,old_attached,_,_) in changed:
+            if old_code:
+                root = self._find(self._node_at[i])
+                self._drop(i, old_attached)
+                neighbors.setdefault(root, set()).update(j for j in (i+1, i-1, i+s, i-s) if cells[j] == old_code)
+        # Removing tiles can only split an area if two or more of its remaining tiles were next to them
+        for (root,tiles) in neighbors.items():
+            seeds = [j for j in tiles if j in self._node_at]
+            if len(seeds) >= 2:
+                self._split(board, root, seeds)
+        for (i,_,_,new_code,new_attached) in changed:
+            if new_code:
+                self._add(i, new_code, new_attached)
+        for (i,_,_,new_code,_) in changed:
+            if new_code:
+                for j in (i+1, i-1, i+s, i-s):
+                    if cells[j] == new_code:
+                        self._union(self._node_at[i], self._node_at[j])
+        return
+
+    def count(self, code, attached=False):
+        """How many (attached) areas of a piece code there are."""
+        return (self._attached_area_counts if attached else self._area_counts).get(code, 0)
+
+    def size(self, i):
+        """Size of the area a tile belongs to (0 for an empty tile)."""
+        node = self._node_at.get(i)
+        return 0 if node is None else self._size[self._find(node)]
+
+    def is_attached(self, i):
+        """Whether the area a tile belongs to touches a log."""
+        node = self._node_at.get(i)
+        return node is not None and self._attached[self._find(node)] > 0
+
+    def sizes(self, code, attached=False):
+        """Sizes of all (attached) areas of a piece code, largest first."""
+        return sorted((self._size[root] for root in self._roots.get(code, ()) if not attached or self._attached[root]), reverse=True)
+
 class _Board:
+    """Game board storing one byte per tile in a flat row-major `bytearray` grid.
+
+    The grid is allocated with some slack around the active area and keeps a
+    logical origin into it, so pushing pieces past the top or left edge only
+    moves the origin instead of rebuilding the board. Occupancy counts per
+    grid row and column keep the active extents up to date as pieces are added,
+    and the number of pieces attached to logs is tracked for every piece type,
+    as well as a hash key of the pieces that follows realignments in constant
+    time. The grid always keeps an empty border of at least one tile around the
+    active area, so neighbors can be looked up without bounds checks.
+    """
+    __slots__ = ('_width', '_height', '_origin_x', '_origin_y', '_stride', '_rows', '_cells',
+                 '_row_counts', '_column_counts', '_attached_counts', '_key', '_regions')
+
     def __init__(self, pieces):
-        self.pieces = pieces
+        self._allocate(1 + max(x for (x,_) in pieces), 1 + max(y for (_,y) in pieces))
+        for (x,y),piece in pieces.items():
+            self._place(x, y, piece + 2)
+        self._count_attached()
+        self._rekey()
+
+    def _allocate(self, width, height):
+        """Set up an empty grid with a minimal border for an active area of the given size."""
+        (self._width, self._height) = (width, height)
+        (self._origin_x, self._origin_y) = (1,1)
+        (self._stride, self._rows) = (width + 2, height + 2)
+        self._cells = bytearray(self._stride * self._rows)
+        self._row_counts = [0] * self._rows
+        self._column_counts = [0] * self._stride
+        self._attached_counts = [0, 0] # Grows along with the highest piece code on the board
+        self._regions = None # Connected areas, only tracked once asked for
+
+    def copy(self):
+        """Return an independent copy of the board."""
+        board = _Board.__new__(_Board)
+        for name in _Board.__slots__:
+            setattr(board, name, getattr(self, name))
+        board._cells = self._cells.copy()
+        board._row_counts = self._row_counts.copy()
+        board._column_counts = self._column_counts.copy()
+        board._attached_counts = self._attached_counts.copy()
+        board._regions = None
+        return board
+
+    def _is_attached(self, i):
+        """Check whether the piece at a grid index is a log or a direct neighbor of one."""
+        cells = self._cells
+        return (cells[i] == _LOG or cells[i+1] == _LOG or cells[i-1] == _LOG
+                or cells[i+self._stride] == _LOG or cells[i-self._stride] == _LOG)
+
+    def _count_attached(self, indices=None, sign=1):
+        """Add the attached pieces among some grid indices to the counts (recounting everything if none are given)."""
+        if indices is None:
+            self._attached_counts = [0] * (1 + max(self._cells))
+            indices = (self._index(x,y) for y in range(self._height) for x in range(self._width))
+        (cells,attached_counts) = (self._cells, self._attached_counts)
+        for i in indices:
+            if cells[i] and self._is_attached(i):
+                attached_counts[cells[i]] += sign
+
+    def _rekey(self):
+        """Recompute the key of all pieces from scratch."""
+        self._key = 0
+        for y in range(self._height):
+            self._key += self._line_key(0, y, 1, 0, self._width - 1)
+        self._key %= _KEY_MODULUS
+
+    def _line_key(self, x, y, dx, dy, length):
+        """Combined key of the pieces on a line segment from a coordinate."""
+        (i,di) = (self._index(x,y), dy*self._stride + dx)
+        # Horner's scheme from the far end: every tile nearer to the start is one step factor less
+        step = _step_key(dx, dy)
+        key = 0
+        for code in reversed(self._cells[i : i + (length+1)*di : di]):
+            key = (key * step + _code_key(code)) % _KEY_MODULUS
+        return key * _key_power(_KEY_BASE_X, x) * _key_power(_KEY_BASE_Y, y) % _KEY_MODULUS
+
+    def _shift_key(self, shift_x, shift_y):
+        """Update the key after all pieces moved by some (possibly negative) amount."""
+        self._key = self._key * _step_key(shift_x, shift_y) % _KEY_MODULUS
+
+    @property
+    def key(self):
+        """61-bit hash key of the pieces on the board."""
+        return self._key
+
+    def rotated_keys(self):
+        """Keys of the pieces on the board rotated by 0, 1, 2 and 3 clockwise quarter turns."""
+        (w,h,cells) = (self._width, self._height, self._cells)
+        keys = [self._key, 0, 0, 0]
+        for y in range(h):
+            i = self._index(0,y)
+            for x in range(w):
+                if cells[i+x]:
+                    keys[1] += _piece_key(cells[i+x], h-1-y, x)
+                    keys[2] += _piece_key(cells[i+x], w-1-x, h-1-y)
+                    keys[3] += _piece_key(cells[i+x], y, w-1-x)
+        return [key % _KEY_MODULUS for key in keys]
+
+    def _place(self, x, y, code):
+        """Put a piece code onto an empty tile inside the active area."""
+        self._cells[self._index(x,y)] = code
+        self._row_counts[self._origin_y + y] += 1
+        self._column_counts[self._origin_x + x] += 1
+
+    def _remove(self, x, y):
+        """Clear an occupied tile inside the active area."""
+        self._cells[self._index(x,y)] = 0
+        self._row_counts[self._origin_y + y] -= 1
+        self._column_counts[self._origin_x + x] -= 1
+
+    def _trim(self):
+        """Shrink the active area so its last row and column are occupied again."""
+        while self._width > 1 and not self._column_counts[self._origin_x + self._width - 1]:
+            self._width -= 1
+        while self._height > 1 and not self._row_counts[self._origin_y + self._height - 1]:
+            self._height -= 1
+
+    def _index(self, x, y):
+        """Flat grid index of a (logical) coordinate."""
+        return (self._origin_y + y)*self._stride + (self._origin_x + x)
 
     def __contains__(self, coordinate):
         """Check whether a coordinate is active on the board."""
-        return self.pieces.__contains__(coordinate)
+        (x,y) = coordinate
+        return (0 <= x < self._width and 0 <= y < self._height
+                and self._cells[self._index(x,y)] != 0)
 
+    @property
+    def pieces(self):
+        """Dictionary view of the board mapping coordinates to pieces (built on access)."""
+        cells = self._cells
+        return { (x,y):cells[i] - 2
+                 for y in range(self._height)
+                 for x in range(self._width)
+                 if cells[i:=self._index(x,y)] }
+
+    def get(self, coordinate):
+        """Return the piece at a coordinate, or None if the tile is empty."""
+        (x,y) = coordinate
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            return None
+        code = self._cells[self._index(x,y)]
+        return (code - 2) if code else None
+
+    def _row(self, y):
+        """Slice of the grid holding the active part of a row."""
+        i = self._index(0,y)
+        return self._cells[i:i+self._width]
+
+    @instrumented('board.show')
     def show(self, get_tile):
         """Print the board as string using a tileset for the piece types."""
-        (w,h) = self.size
+        tiles = [get_tile(None)] + [get_tile(code - 2) for code in range(1, max(self._cells) + 1)]
         string = (
             "\n".join(
                 "".join(
-                    get_tile(self.pieces.get((x,y)))
-                for x in range(w) )
-            for y in range(h) )
+                    tiles[code]
+                for code in self._row(y) )
+            for y in range(self._height) )
         )
         return string
 
     @property
     def size(self):
         """Active (width,height) of the board."""
-        max_x = max(x for (x,_) in self.pieces)
-        max_y = max(y for (_,y) in self.pieces)
-        return (max_x + 1, max_y + 1)
+        return (self._width, self._height)
+
+    def row_count(self, y):
+        """How many pieces are in a row of the board."""
+        return self._row_counts[self._origin_y + y] if 0 <= y < self._height else 0
 
+    def column_count(self, x):
+        """How many pieces are in a column of the board."""
+        return self._column_counts[self._origin_x + x] if 0 <= x < self._width else 0
+
+    @instrumented('board.pruned')
     def pruned(self):
         """Return a copy of board with all leaves not attached to log pieces removed."""
-        def is_log(x,y):
-            return self.pieces[(x,y)] == -1
-        def has_log_neighbor(x,y):
-           return any(is_log(x+dx,y+dy)
-                      for (dx,dy) in [(1,0),(0,1),(-1,0),(0,-1)]
-                      if (x+dx,y+dy) in self.pieces)
-        unpruned_pieces = dict()
-        for (x,y),piece in self.pieces.items():
-            if is_log(x,y) or has_log_neighbor(x,y):
-                unpruned_pieces[(x,y)] = piece
-        return _Board(unpruned_pieces)
+        board = _Board.__new__(_Board)
+        board._allocate(self._width, self._height)
+        # Attached pieces are the logs and their neighbors, so only look around logs
+        (cells,s) = (self._cells, self._stride)
+        attached = set()
+        i = cells.find(_LOG)
+        while i != -1:
+            attached.update(j for j in (i, i+1, i-1, i+s, i-s) if cells[j])
+            i = cells.find(_LOG, i+1)
+        board._key = 0
+        for i in attached:
+            (x,y) = (i % s - self._origin_x, i // s - self._origin_y)
+            board._place(x, y, cells[i])
+            board._key += _piece_key(cells[i], x, y)
+        board._key %= _KEY_MODULUS
+        # Trim to the extent of the remaining pieces
+        board._trim()
+        board._attached_counts = self._attached_counts.copy()
+        return board
 
     def counts(self):
         """Return how many pieces of each type are present on the board."""
-        return dict(Counter(self.pruned().pieces.values()))
-
-    def realign(self):
-        """Normalize the coordinates of all pieces to range from 0 to (board width/height) - 1."""
-        min_x = min(x for (x,_) in self.pieces)
-        min_y = min(y for (_,y) in self.pieces)
-        pieces = self.pieces
-        # Fix horizontal misalignment
-        if min_x < 0:
-            new_pieces = dict()
-            for (x,y),piece in pieces.items():
-                new_pieces[(x - min_x, y)] = piece
-            pieces = new_pieces
-        # Fix vertical misalignment
-        if min_y < 0:
-            new_pieces = dict()
-            for (x,y),piece in pieces.items():
-                  new_pieces[(x, y - min_y)] = piece
-            pieces = new_pieces
-        self.pieces = pieces
-        return None
+        return { code - 2:n
+                 for code,n in enumerate(self._attached_counts)
+                 if n }
+
+    def _areas(self):
+        """Connected areas of the board, tracked from now on."""
+        if self._regions is None:
+            self._regions = _Regions(self)
+        return self._regions
+
+    def area_count(self, piece, attached=False):
+        """Return how many connected areas of a piece type are on the board (only those touching a log if `attached`)."""
+        return self._areas().count(piece + 2, attached)
+
+    def area_size(self, coordinate):
+        """Return how many pieces the connected area of equal pieces at a coordinate has (0 for an empty tile)."""
+        (x,y) = coordinate
+        if coordinate not in self:
+            return 0
+        return self._areas().size(self._index(x,y))
+
+    def area_sizes(self, piece, attached=False):
+        """Return the sizes of all connected areas of a piece type, largest first (only those touching a log if `attached`)."""
+        return self._areas().sizes(piece + 2, attached)
+
+    @instrumented('board.realign')
+    def realign(self, x, y):
+        """Extend the board to contain a coordinate, normalizing coordinates to range from 0 to (board width/height) - 1. Returns how far existing pieces were shifted."""
+        (shift_x,shift_y) = (max(0, -x), max(0, -y))
+        (new_w,new_h) = (max(self._width, x+1) + shift_x, max(self._height, y+1) + shift_y)
+        # Reallocate the grid only when we run out of slack
+        if not (1 <= self._origin_x - shift_x and self._origin_x - shift_x + new_w < self._stride
+                and 1 <= self._origin_y - shift_y and self._origin_y - shift_y + new_h < self._rows):
+            (stride,rows) = (2*new_w + 2, 2*new_h + 2)
+            (origin_x,origin_y) = ((stride - new_w)//2 + shift_x, (rows - new_h)//2 + shift_y)
+            cells = bytearray(stride * rows)
+            (row_counts,column_counts) = ([0] * rows, [0] * stride)
+            for y_old in range(self._height):
+                i = (origin_y + y_old)*stride + origin_x
+                cells[i:i+self._width] = self._row(y_old)
+                row_counts[origin_y + y_old] = self.row_count(y_old)
+            for x_old in range(self._width):
+                column_counts[origin_x + x_old] = self.column_count(x_old)
+            (self._stride, self._rows, self._cells) = (stride, rows, cells)
+            (self._row_counts, self._column_counts) = (row_counts, column_counts)
+            (self._origin_x, self._origin_y) = (origin_x, origin_y)
+            self._regions = None # Grid indices changed, areas are recomputed when asked for again
+        # Move the logical origin onto the new top left corner
+        self._origin_x -= shift_x
+        self._origin_y -= shift_y
+        (self._width, self._height) = (new_w, new_h)
+        return (shift_x,shift_y)
+
+    def push(self, coordinate, step, piece):
+        """Insert a piece into a line at its first active tile, moving the consecutive pieces found there one tile further."""
+        ((x,y),(dx,dy)) = (coordinate, step)
+        # Scan the line as bytes: skip empty tiles at the beginning, then find the first empty tile behind the consecutive pieces
+        (i,di) = (self._index(x,y), dy*self._stride + dx)
+        line = self._cells[i : i + (self._width if dx else self._height)*di : di]
+        start = len(line) - len(line.lstrip(b'\0'))
+        end = line.find(0, start)
+        length = (len(line) if end == -1 else end) - start
+        (x,y) = (x + start*dx, y + start*dy)
+        # Make room for the last piece if it is pushed off the board
+        (shift_x,shift_y) = self.realign(x + length*dx, y + length*dy)
+        (x,y) = (x + shift_x, y + shift_y)
+        # Realignment moved every piece to a new coordinate
+        if shift_x or shift_y:
+            self._shift_key(shift_x, shift_y)
+        (i,di,cells) = (self._index(x,y), dy*self._stride + dx, self._cells)
+        affected = self._affected(i, di, length)
+        if self._regions is not None:
+            before = [ (j, cells[j], cells[j] and self._is_attached(j)) for j in affected ]
+        self._count_attached(affected, -1)
+        run_key = self._line_key(x, y, dx, dy, length - 1)
+        code = piece + 2
+        if code >= len(self._attached_counts):
+            self._attached_counts.extend([0] * (1 + code - len(self._attached_counts)))
+        # Move consecutive pieces one tile further at once
+        end = i + length*di
+        last_code = cells[end-di]
+        cells[i+di:end:di] = cells[i:end-di:di]
+        cells[i] = code
+        # Only the tile behind the consecutive pieces gets newly occupied
+        self._place(x + length*dx, y + length*dy, last_code)
+        self._count_attached(affected, +1)
+        if self._regions is not None:
+            self._regions.update(self, before)
+        # The run moved one step along the line, and the new piece took its place
+        self._key = (self._key + (_step_key(dx, dy) - 1)*run_key + _piece_key(code, x, y)) % _KEY_MODULUS
+        return ((x,y), length, (shift_x,shift_y))
+
+    def pull(self, coordinate, step, length, shift):
+        """Undo a push given where the piece was inserted, the direction, how many pieces moved and how far the board was realigned. Returns the piece that was pushed."""
+        ((x,y),(dx,dy),(shift_x,shift_y)) = (coordinate, step, shift)
+        (i,di,cells) = (self._index(x,y), dy*self._stride + dx, self._cells)
+        affected = self._affected(i, di, length)
+        if self._regions is not None:
+            before = [ (j, cells[j], cells[j] and self._is_attached(j)) for j in affected ]
+        self._count_attached(affected, -1)
+        run_key = self._line_key(x + dx, y + dy, dx, dy, length - 1)
+        # Move consecutive pieces back at once
+        code = cells[i]
+        end = i + length*di
+        cells[i:end:di] = cells[i+di:end+di:di]
+        self._remove(x + length*dx, y + length*dy)
+        self._count_attached(affected, +1)
+        if self._regions is not None:
+            self._regions.update(self, before)
+        # The run moved one step back, and the pushed piece is gone
+        self._key = (self._key + (_step_key(-dx, -dy) - 1)*run_key - _piece_key(code, x, y)) % _KEY_MODULUS
+        # Undo realignment: the tile freed up was the only one in its first row/column
+        if shift_x or shift_y:
+            self._origin_x += shift_x
+            self._origin_y += shift_y
+            self._width -= shift_x
+            self._height -= shift_y
+            self._shift_key(-shift_x, -shift_y)
+        self._trim()
+        return code - 2
+
+    def _affected(self, i, di, length):
+        """Grid indices whose attachment may change when moving the pieces along a line."""
+        line = range(i, i + (length+1)*di, di)
+        # Only tiles of the line can change attachment, unless a log moves along with them
+        if _LOG in self._cells[line.start:line.stop:line.step]:
+            s = self._stride
+            return { j+dj for j in line for dj in (0, 1, -1, s, -s) }
+        return line
 
 class Game:
     def __init__(self, log_pieces=5, players=2, pieces_per_player=10):
+        if players > MAX_PLAYERS:
+            raise ValueError(f"a game can have at most {MAX_PLAYERS} players, not {players}")
         self._log_pieces = log_pieces
         self._players = players
         self._pieces_per_player = pieces_per_player
@@ -111,18 +609,33 @@ class Game:
         """Reset the state of the game to the beginning."""
         self._board = _Board({ (0,y):-1 for y in range(self._log_pieces) })
         self._remaining_pieces = [self._pieces_per_player for _ in range(self._players)]
-        def make_sequence(players, turns_per_player):
-            player = 0
-            while True:
-                for _ in range(turns_per_player):
-                    yield player
-                player = (player+1) % players
-        self._player_sequence = make_sequence(self._players, 2)
-        next(self._player_sequence)
-        self._current_turn = (next(self._player_sequence), None)
+        self._current_turn = (self._player_at(0), None)
         self._turn_history = []
+        self._move_stack = []
+        self._state_key = _turn_key(self._current_turn)
+        for (player,remaining) in enumerate(self._remaining_pieces):
+            self._state_key ^= _remaining_key(player, remaining)
         return
 
+    def _player_at(self, turn_number, turns_per_player=2):
+        """Which player plays a given turn: the first player gets one turn, then each player gets two in a row."""
+        return ((turn_number + 1) // turns_per_player) % self._players
+
+    def clone(self):
+        """Return an independent copy of the game in its current state."""
+        game = Game.__new__(Game)
+        game.__dict__.update(self.__dict__)
+        game._board = self._board.copy()
+        game._remaining_pieces = self._remaining_pieces.copy()
+        game._turn_history = self._turn_history.copy()
+        game._move_stack = self._move_stack.copy()
+        return game
+
+    @property
+    def log_pieces(self):
+        """How many log pieces the game starts with."""
+        return self._log_pieces
+
     @property
     def players(self):
         """How many players are playing the game."""
@@ -158,11 +671,56 @@ class Game:
         """The turns already played."""
         return '\n'.join(self._turn_history)
 
+    @property
+    def current_move_history(self):
+        """The (offset,direction) moves already played."""
+        return [move for (_,move,*_) in self._move_stack]
+
     @property
     def remaining_pieces(self):
         """A list of how many pieces each player has left to play."""
         return self._remaining_pieces.copy()
 
+    @property
+    def position_key(self):
+        """64-bit key of the pieces on the board, the pieces left to play and the current turn (a board key combined with Zobrist keys of the rest)."""
+        return self._board.key ^ self._state_key
+
+    def symmetric_keys(self):
+        """Position keys of the game with the board rotated by 0, 1, 2 and 3 clockwise quarter turns (and the direction turned along)."""
+        keys = self._board.rotated_keys()
+        state_key = self._state_key ^ _turn_key(self._current_turn)
+        for quarter_turns in range(4):
+            keys[quarter_turns] ^= state_key ^ _turn_key(_rotate_turn(self._current_turn, quarter_turns))
+        return keys
+
+    @property
+    def canonical_key(self):
+        """Position key that is the same for all positions equal up to rotation of the board.
+
+        Rotations are the only symmetries of the game: mirroring the board would also
+        reverse the clockwise order in which forced directions follow each other.
+        """
+        return min(self.symmetric_keys())
+
+    @property
+    def canonical_rotation(self):
+        """How many clockwise quarter turns rotate the game into the position `canonical_key` belongs to."""
+        keys = self.symmetric_keys()
+        return keys.index(min(keys))
+
+    def from_canonical_move(self, move, rotation=None):
+        """Rotate a move from the rotation of the position `canonical_key` belongs to back onto the game."""
+        if rotation is None:
+            rotation = self.canonical_rotation
+        (w,h) = self._board.size
+        rotated_size = (h,w) if rotation % 2 else (w,h)
+        return rotate_move(move, -rotation, rotated_size)
+
+    def book_moves(self, book):
+        """Moves an opening book (e.g. `leaves_book.Book`) has for the current position, most played first (empty once out of book)."""
+        return book.lookup(self)
+
     @property
     def current_board_size(self):
         """Active (width,height) of the board."""
@@ -174,6 +732,11 @@ class Game:
         scores.pop(-1) # Log pieces have id = -1
         return scores
 
+    def area_counts(self, attached=False):
+        """Return how many connected areas of pieces each player has on the board (only those touching a log if `attached`)."""
+        board = self._board
+        return { player:board.area_count(player, attached) for player in range(self._players) }
+
     def compute_winners(self):
         """Compute the winners of the game. Several if there is a draw, none if the game is not over yet."""
         if not self.is_over:
@@ -183,12 +746,18 @@ class Game:
         winners = [player for (player,score) in scores.items() if score == best_score]
         return winners
 
+    @instrumented('game.make_move')
     def make_move(self, offset, new_direction):
         """Try to make a move for the current player given a line offset and the intended direction."""
         # Abort if move is invalid
         err = self.check_move(offset, new_direction)
         if err:
             raise ValueError(err)
+        self.apply_move(offset, new_direction)
+        return
+
+    def apply_move(self, offset, new_direction):
+        """Make a move for the current player without validating it first (e.g. one produced by `legal_moves`)."""
         # Prepare to modify board
         (player,direction) = self._current_turn
         (w,h) = self._board.size
@@ -198,31 +767,52 @@ class Game:
             Dir.SOUTH: ((offset,h-1), ( 0,-1)),
             Dir.WEST : ((0,offset),   ( 1, 0)),
         }[new_direction]
-        # Skip empty tiles at the beginning
-        while (x,y) not in self._board:
-            x += dx
-            y += dy
-        # Sequentially move consecutive pieces we find
-        moving_piece = player
-        while moving_piece is not None:
-            (moving_piece, self._board.pieces[(x,y)]) = (self._board.pieces.get((x,y)), moving_piece)
-            x += dx
-            y += dy
-        self._board.realign()
+        (coordinate,length,shift) = self._board.push((x,y), (dx,dy), player)
         # Update internal game state
+        self._move_stack.append((self._current_turn, (offset,new_direction), coordinate, (dx,dy), length, shift))
+        self._state_key ^= self._update_key(player)
         self._remaining_pieces[player] -= 1
         self._turn_history.append(f"{(new_direction.name[0] if direction is None else '')}{offset+1}") # Game notation not 100% same as in original manual
-        try:
-            next_player = next(self._player_sequence)
+        # No pieces left = out of turns
+        if sum(self._remaining_pieces) == 0:
+            self._current_turn = None
+        else:
+            next_player = self._player_at(self.current_turn_number)
             next_direction = None if next_player != player else Dir((new_direction.value + 1) % 4)
             self._current_turn = (next_player,next_direction)
-            # No pieces left = out of turns
-            if sum(self._remaining_pieces) == 0:
-                raise StopIteration
-        except StopIteration:
-            self._current_turn = None
+        self._state_key ^= self._update_key(player)
         return
 
+    def _update_key(self, player):
+        """Part of the state key that changes when a player makes a move."""
+        return _turn_key(self._current_turn) ^ _remaining_key(player, self._remaining_pieces[player])
+
+    def unmake_move(self):
+        """Take back the last move made, restoring the game state from before it."""
+        if not self._move_stack:
+            raise ValueError("no moves to unmake")
+        (turn,_,coordinate,step,length,shift) = self._move_stack.pop()
+        player = self._board.pull(coordinate, step, length, shift)
+        # Restore internal game state
+        self._state_key ^= self._update_key(player)
+        self._remaining_pieces[player] += 1
+        self._turn_history.pop()
+        self._current_turn = turn
+        self._state_key ^= self._update_key(player)
+        return
+
+    def legal_moves(self):
+        """Generate all (offset,direction) moves the current player can make."""
+        if self.is_over:
+            return
+        (player,direction) = self._current_turn
+        (w,h) = self._board.size
+        for new_direction in (list(Dir) if direction is None else [direction]):
+            max_offset = h if new_direction in (Dir.EAST,Dir.WEST) else w
+            for offset in range(max_offset):
+                yield (offset,new_direction)
+
+    @instrumented('game.check_move')
     def check_move(self, offset, new_direction):
         """Check whether a given move is possible for the current player given a line offset and the intended direction."""
         # Invalid argument types or game over
@@ -247,7 +837,65 @@ class Game:
 
 
 # BEGIN FUNCTIONS
-# No functions
+
+@cache
+def _zobrist(n):
+    """Pseudorandom 64-bit key for a nonnegative integer (SplitMix64, fixed so keys are stable across runs)."""
+    z = (n + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return z ^ (z >> 31)
+
+def _piece_key(code, x, y):
+    """Board key of a piece code at a coordinate."""
+    return _code_key(code) * _key_power(_KEY_BASE_X, x) * _key_power(_KEY_BASE_Y, y) % _KEY_MODULUS
+
+@cache
+def _code_key(code):
+    """Board key of a piece code at (0,0) (0 for an empty tile)."""
+    return _zobrist(code << 2) % _KEY_MODULUS if code else 0
+
+@cache
+def _key_power(base, exponent):
+    """Power of a board key base (negative exponents give powers of its inverse)."""
+    return pow(base, exponent, _KEY_MODULUS)
+
+@cache
+def _step_key(dx, dy):
+    """Factor a board key changes by when a piece moves by (dx,dy)."""
+    return _key_power(_KEY_BASE_X, dx) * _key_power(_KEY_BASE_Y, dy) % _KEY_MODULUS
+
+def _remaining_key(player, remaining):
+    """Zobrist key of how many pieces a player has left."""
+    return _zobrist(((player << 24 | remaining) << 2) | 1)
+
+def _turn_key(turn):
+    """Zobrist key of the current (player,direction) turn, or of the game being over."""
+    if turn is None:
+        return _zobrist(3)
+    (player,direction) = turn
+    return _zobrist(((player << 3 | (0 if direction is None else 1 + direction.value)) << 2) | 2)
+
+def _rotate_turn(turn, quarter_turns):
+    """Turn with its direction rotated clockwise by some quarter turns."""
+    if turn is None or turn[1] is None:
+        return turn
+    (player,direction) = turn
+    return (player, Dir((direction.value + quarter_turns) % 4))
+
+def rotate_move(move, quarter_turns, size):
+    """Move on a board of a given (width,height) after rotating the board clockwise by some quarter turns.
+
+    Use `rotate_move(move, -quarter_turns, rotated_size)` to rotate a move back.
+    """
+    ((offset,direction),(w,h)) = (move, size)
+    # Follow a tile on the moved line through the rotation
+    (x,y) = (offset,0) if direction in (Dir.NORTH,Dir.SOUTH) else (0,offset)
+    for _ in range(quarter_turns % 4):
+        (x,y,w,h) = (h-1-y, x, h, w)
+    new_direction = Dir((direction.value + quarter_turns) % 4)
+    return (x if new_direction in (Dir.NORTH,Dir.SOUTH) else y, new_direction)
+
 # END   FUNCTIONS
 
 
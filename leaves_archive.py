@@ -0,0 +1,180 @@
+# BEGIN OUTLINE
+"""
+This script contains a compact binary archive format for many `leaves.Game`s.
+
+File layout (all integers little-endian):
+    - Header: magic b'LVSA', format version (u16), log_pieces (u16), players (u16),
+      pieces_per_player (u16), number of games (u64), file position of the index (u64)
+    - Moves: in version 1 one byte per move, `direction << 6 | offset` (so offsets
+      must be < 64), in version 2 two bytes per move, `direction << 14 | offset`
+    - Index: (number of games + 1) file positions (u64) where each game's moves
+      start, the last one being where the moves end
+Archives are read through `mmap`, so any game can be loaded without scanning
+the file before it. Version 1 is written whenever no line of a configuration
+can be longer than 64 tiles, version 2 for larger games.
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import mmap # Random access to archive files
+import struct # Packing headers and indices
+import leaves
+from leaves import Dir
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+MAGIC = b'LVSA'
+"""Bytes every archive file starts with."""
+
+VERSION = 1
+"""Version of the archive format written for configurations with offsets fitting into one byte per move."""
+
+VERSION_WIDE = 2
+"""Version of the archive format written for larger configurations."""
+
+_HEADER = struct.Struct('<4sHHHHQQ')
+_INDEX_ENTRY = struct.Struct('<Q')
+
+MAX_OFFSET = 63
+"""Largest line offset a move in a version 1 archive can have."""
+
+MAX_OFFSET_WIDE = 16383
+"""Largest line offset a move in a version 2 archive can have."""
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+class ArchiveWriter:
+    """Write games to a new archive file, to be used as context manager (or closed explicitly)."""
+    def __init__(self, path, log_pieces=5, players=2, pieces_per_player=10):
+        self._config = (log_pieces, players, pieces_per_player)
+        # Lines are never longer than the number of pieces in the game
+        self._wide = log_pieces + players*pieces_per_player > MAX_OFFSET + 1
+        self._version = VERSION_WIDE if self._wide else VERSION
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, self._version, *self._config, 0, 0))
+        self._index = [_HEADER.size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def add(self, game):
+        """Append a game (or a list of (offset,direction) moves) to the archive."""
+        if isinstance(game, leaves.Game):
+            moves = game.current_move_history
+        else:
+            moves = game
+        data = encode_moves(moves, self._wide)
+        self._file.write(data)
+        self._index.append(self._index[-1] + len(data))
+        return
+
+    def close(self):
+        """Write index and header, then close the file."""
+        if self._file.closed:
+            return
+        self._file.write(b''.join(_INDEX_ENTRY.pack(position) for position in self._index))
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, self._version, *self._config, len(self._index) - 1, self._index[-1]))
+        self._file.close()
+        return
+
+class Archive:
+    """Read-only random access to the games of an archive file, to be used as context manager (or closed explicitly)."""
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic,version,log_pieces,players,pieces_per_player,games,index_position) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version not in (VERSION, VERSION_WIDE):
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} or {VERSION_WIDE} leaves archive")
+        self._config = (log_pieces, players, pieces_per_player)
+        self._wide = version == VERSION_WIDE
+        self._games = games
+        self._index_position = index_position
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Release the memory map of the file."""
+        self._map.close()
+        return
+
+    @property
+    def config(self):
+        """(log_pieces,players,pieces_per_player) of all games in the archive."""
+        return self._config
+
+    def __len__(self):
+        """How many games are in the archive."""
+        return self._games
+
+    def __getitem__(self, n):
+        """The (offset,direction) moves of the n-th game."""
+        if n < 0:
+            n += self._games
+        if not (0 <= n < self._games):
+            raise IndexError(f"archive has no game {n}")
+        (start,end) = struct.unpack_from('<QQ', self._map, self._index_position + n*_INDEX_ENTRY.size)
+        return decode_moves(self._map[start:end], self._wide)
+
+    def __iter__(self):
+        """Generate the moves of all games in order."""
+        for n in range(self._games):
+            yield self[n]
+
+    def replay(self, n, game=None):
+        """Make the moves of the n-th game on a game (reset first), or on a new `leaves.Game` of the archive's configuration."""
+        if game is None:
+            game = leaves.Game(*self._config)
+        else:
+            game.reset()
+        for (offset,direction) in self[n]:
+            game.make_move(offset, direction)
+        return game
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def encode_moves(moves, wide=False):
+    """Pack (offset,direction) moves into one byte each (two bytes each if wide)."""
+    max_offset = MAX_OFFSET_WIDE if wide else MAX_OFFSET
+    if any(not (0 <= offset <= max_offset) for (offset,_) in moves):
+        raise ValueError(f"move offsets must be in range 0 to {max_offset} to be archived")
+    if wide:
+        return struct.pack(f'<{len(moves)}H', *(direction.value << 14 | offset for (offset,direction) in moves))
+    return bytes(direction.value << 6 | offset for (offset,direction) in moves)
+
+def decode_moves(data, wide=False):
+    """Unpack (offset,direction) moves from one byte each (two bytes each if wide)."""
+    if wide:
+        return [(word & MAX_OFFSET_WIDE, Dir(word >> 14)) for word in struct.unpack(f'<{len(data)//2}H', data)]
+    return [(byte & MAX_OFFSET, Dir(byte >> 6)) for byte in data]
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+# No main
+# END   MAIN
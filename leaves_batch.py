@@ -0,0 +1,228 @@
+# BEGIN OUTLINE
+"""
+This script contains a `BatchGame` class to play many `leaves.Game`s at once with numpy.
+
+All games of a batch share their configuration and are stored as stacked
+arrays: the boards (one byte per tile, coded like `leaves._Board`), the pieces
+left per player and the turn state. Each `step` applies one move to every game
+that is not over yet, all at the same time.
+Boards are allocated large enough that no game can ever run out of room:
+every move extends a board by at most one tile in one direction, so the logs
+start in the middle of a grid that has room for all moves on every side, and
+realignment only means moving the top left corner of the active area.
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import numpy as np
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+NORTH, EAST, SOUTH, WEST = 0, 1, 2, 3 # Same values as `leaves.Dir`
+
+NO_DIRECTION = -1
+"""Value of `current_direction` if the current player may pick any direction."""
+
+_LOG = 1 # Board tiles are coded like in `leaves._Board`: 0 for empty, piece id + 2 otherwise
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+class BatchGame:
+    def __init__(self, games, log_pieces=5, players=2, pieces_per_player=10):
+        self._games = games
+        self._log_pieces = log_pieces
+        self._players = players
+        self._pieces_per_player = pieces_per_player
+        # Room for every move on every side of the logs
+        turns = players * pieces_per_player
+        self._grid_size = (1 + 2*turns, log_pieces + 2*turns)
+        self.reset()
+
+    def reset(self):
+        """Reset the state of all games to the beginning."""
+        (grid_w,grid_h) = self._grid_size
+        turns = self._players * self._pieces_per_player
+        self._boards = np.zeros((self._games, grid_h, grid_w), dtype=np.uint8)
+        self._boards[:, turns:turns+self._log_pieces, turns] = _LOG
+        # Active area of each board as inclusive grid coordinates
+        self._min_x = np.full(self._games, turns)
+        self._max_x = np.full(self._games, turns)
+        self._min_y = np.full(self._games, turns)
+        self._max_y = np.full(self._games, turns + self._log_pieces - 1)
+        self._remaining_pieces = np.full((self._games, self._players), self._pieces_per_player)
+        self._turn_number = np.zeros(self._games, dtype=np.int64)
+        self._current_direction = np.full(self._games, NO_DIRECTION)
+        return
+
+    @property
+    def games(self):
+        """How many games are played at once."""
+        return self._games
+
+    @property
+    def players(self):
+        """How many players are playing each game."""
+        return self._players
+
+    @property
+    def is_over(self):
+        """Boolean array of which games are finished."""
+        return self._remaining_pieces.sum(axis=1) == 0
+
+    @property
+    def current_player(self):
+        """Array of whose turn it is in each game (meaningless for finished games)."""
+        return ((self._turn_number + 1) // 2) % self._players
+
+    @property
+    def current_direction(self):
+        """Array of the direction forced onto each current player, `NO_DIRECTION` if any may be picked."""
+        return self._current_direction.copy()
+
+    @property
+    def current_turn_number(self):
+        """Array of the number of turns already played in each game."""
+        return self._turn_number.copy()
+
+    @property
+    def remaining_pieces(self):
+        """Array of how many pieces each player has left to play in each game."""
+        return self._remaining_pieces.copy()
+
+    @property
+    def current_board_size(self):
+        """Arrays of the active width and height of each board."""
+        return (self._max_x - self._min_x + 1, self._max_y - self._min_y + 1)
+
+    def board(self, i):
+        """Active part of the board of a game as a 2D array of tile codes."""
+        return self._boards[i, self._min_y[i]:self._max_y[i]+1, self._min_x[i]:self._max_x[i]+1]
+
+    def aligned_boards(self, width, height):
+        """Array of all boards cut to a fixed (width,height), with their active area in the top left corner."""
+        rows = self._min_y[:,None] + np.arange(height)
+        columns = self._min_x[:,None] + np.arange(width)
+        (grid_w,grid_h) = self._grid_size
+        inside = (rows < grid_h)[:,:,None] & (columns < grid_w)[:,None,:]
+        rows = np.minimum(rows, grid_h - 1)
+        columns = np.minimum(columns, grid_w - 1)
+        return self._boards[np.arange(self._games)[:,None,None], rows[:,:,None], columns[:,None,:]] * inside
+
+    def pieces(self, i):
+        """Board of a game as dictionary from coordinates to pieces, like `leaves._Board.pieces`."""
+        board = self.board(i)
+        return { (int(x),int(y)):int(board[y,x]) - 2 for (y,x) in zip(*np.nonzero(board)) }
+
+    def random_moves(self, rng):
+        """Arrays of (offsets,directions) picking a random valid move for every game."""
+        (w,h) = self.current_board_size
+        directions = np.where(self._current_direction == NO_DIRECTION,
+                              rng.integers(0, 4, self._games), self._current_direction)
+        extents = np.where((directions == EAST) | (directions == WEST), h, w)
+        offsets = (rng.random(self._games) * extents).astype(np.int64)
+        return (offsets,directions)
+
+    def step(self, offsets, directions):
+        """Make one move in every game that is not over yet, given arrays of line offsets and directions.
+
+        Moves are not validated, they must be valid for their game like ones accepted by `leaves.Game.check_move`.
+        """
+        games = np.nonzero(~self.is_over)[0]
+        if len(games) == 0:
+            return
+        (offsets,directions) = (np.asarray(offsets)[games], np.asarray(directions)[games])
+        players = self.current_player[games]
+        (grid_w,grid_h) = self._grid_size
+        # Coordinates of every grid tile along each pushed line, in the direction pieces move
+        k = np.arange(max(grid_w, grid_h))
+        vertical = (directions == NORTH) | (directions == SOUTH)
+        forwards = (directions == NORTH) | (directions == WEST)
+        line_length = np.where(vertical, grid_h, grid_w)
+        along = np.where(forwards[:,None], k, line_length[:,None] - 1 - k)
+        inside = (0 <= along) & (along < line_length[:,None])
+        along = np.clip(along, 0, line_length[:,None] - 1)
+        across = np.where(vertical, self._min_x[games], self._min_y[games]) + offsets
+        rows = np.where(vertical[:,None], along, across[:,None])
+        columns = np.where(vertical[:,None], across[:,None], along)
+        line = self._boards[games[:,None], rows, columns] * inside
+        # Skip empty tiles at the beginning, then find the end of the consecutive pieces
+        occupied = line != 0
+        start = occupied.argmax(axis=1)
+        end = (~occupied & (k >= start[:,None])).argmax(axis=1)
+        # Move consecutive pieces one tile further and insert the new piece
+        moved = (k >= start[:,None]) & (k <= end[:,None])
+        shifted = np.zeros_like(line)
+        shifted[:,1:] = line[:,:-1]
+        shifted[np.arange(len(games)), start] = players + 2
+        self._boards[np.broadcast_to(games[:,None], line.shape)[moved], rows[moved], columns[moved]] = shifted[moved]
+        # Only the tile behind the consecutive pieces can extend the active area
+        end_x = columns[np.arange(len(games)), end]
+        end_y = rows[np.arange(len(games)), end]
+        self._min_x[games] = np.minimum(self._min_x[games], end_x)
+        self._max_x[games] = np.maximum(self._max_x[games], end_x)
+        self._min_y[games] = np.minimum(self._min_y[games], end_y)
+        self._max_y[games] = np.maximum(self._max_y[games], end_y)
+        # Update turn state
+        self._remaining_pieces[games, players] -= 1
+        self._turn_number[games] += 1
+        next_players = ((self._turn_number[games] + 1) // 2) % self._players
+        self._current_direction[games] = np.where(next_players == players, (directions + 1) % 4, NO_DIRECTION)
+        return
+
+    def scores(self):
+        """Array of how many pieces of each player are attached to logs on each board."""
+        boards = self._boards
+        logs = boards == _LOG
+        attached = logs.copy()
+        attached[:, 1:, :] |= logs[:, :-1, :]
+        attached[:, :-1, :] |= logs[:, 1:, :]
+        attached[:, :, 1:] |= logs[:, :, :-1]
+        attached[:, :, :-1] |= logs[:, :, 1:]
+        codes = np.where(attached, boards, 0)
+        return np.stack([(codes == player + 2).sum(axis=(1,2)) for player in range(self._players)], axis=1)
+
+    def compute_winners(self):
+        """Boolean array of which players won each game (several if there is a draw, none if not over yet)."""
+        scores = self.scores()
+        winners = scores == scores.max(axis=1, keepdims=True)
+        winners &= self.is_over[:,None]
+        return winners
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def play_random(games, seed=None, log_pieces=5, players=2, pieces_per_player=10):
+    """Play a batch of games with random moves, returning the moves made and the final scores.
+
+    Moves are returned as an array of shape (turns, games, 2) holding (offset,direction) pairs.
+    """
+    rng = np.random.default_rng(seed)
+    batch = BatchGame(games, log_pieces, players, pieces_per_player)
+    moves = []
+    while not batch.is_over.all():
+        (offsets,directions) = batch.random_moves(rng)
+        batch.step(offsets, directions)
+        moves.append(np.stack([offsets,directions], axis=1))
+    return (np.array(moves).reshape(-1, games, 2), batch.scores())
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+# No main
+# END   MAIN
@@ -0,0 +1,269 @@
+# BEGIN OUTLINE
+"""
+This script benchmarks the `leaves` engine and its frontends.
+
+Every benchmark replays the same seeded random games for several game
+configurations and reports operations per second (best of a few repeats):
+    - make_move, check_move: the move logic of `leaves.Game`
+    - pruned, counts, realign, show: board operations on positions of those games
+    - random_game: whole random games from the start
+    - console_status: the turn text of `leaves_console.text_status`
+    - pygame_frame: headless frames of `leaves_pygame.draw_frame` (skipped without pygame)
+Results can be written as JSON and compared against a saved baseline; the
+script exits with status 1 if any benchmark got slower than the tolerance allows.
+
+Usage: python leaves_bench.py [--only NAME ...] [--seed 0] [--repeat 3] [--json OUT] [--baseline BASE] [--tolerance 0.1]
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import argparse # Command line interface
+from functools import cache # Opening the pygame window once
+import json # Result files
+import os # Headless pygame
+import random # Seeded random games
+import sys # Exit status
+import time # Measuring speed
+import leaves
+from leaves import Dir
+import leaves_console
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+CONFIGS = [
+    (5, 2, 10), # Default game
+    (3, 2, 5), # Small game
+    (7, 4, 12), # Many players
+]
+"""(log_pieces,players,pieces_per_player) of the games benchmarked."""
+
+GAMES = 20 # Random games replayed per configuration
+
+MIN_SECONDS = 0.2 # Benchmarks are run repeatedly until they take at least this long
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+# No classes
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def random_games(config, seed, games=GAMES):
+    """Return the move lists of some random games of a configuration."""
+    rng = random.Random(seed)
+    game = leaves.Game(*config)
+    move_lists = []
+    for _ in range(games):
+        game.reset()
+        while not game.is_over:
+            game.apply_move(*rng.choice(list(game.legal_moves())))
+        move_lists.append(game.current_move_history)
+    return move_lists
+
+def positions(config, move_lists):
+    """Return clones of every position reached in some games."""
+    game = leaves.Game(*config)
+    result = []
+    for moves in move_lists:
+        game.reset()
+        for move in moves:
+            game.make_move(*move)
+            result.append(game.clone())
+    return result
+
+def bench_make_move(config, move_lists):
+    game = leaves.Game(*config)
+    def run():
+        for moves in move_lists:
+            game.reset()
+            for move in moves:
+                game.make_move(*move)
+    return (run, sum(len(moves) for moves in move_lists))
+
+def bench_check_move(config, move_lists):
+    games = positions(config, move_lists[:5])
+    moves = [ (game,offset,direction)
+              for game in games
+              for direction in Dir
+              for offset in range(max(game.current_board_size) + 1) ]
+    def run():
+        for (game,offset,direction) in moves:
+            game.check_move(offset, direction)
+    return (run, len(moves))
+
+def bench_pruned(config, move_lists):
+    boards = [game.board for game in positions(config, move_lists[:5])]
+    def run():
+        for board in boards:
+            board.pruned()
+    return (run, len(boards))
+
+def bench_counts(config, move_lists):
+    boards = [game.board for game in positions(config, move_lists[:5])]
+    def run():
+        for board in boards:
+            board.counts()
+    return (run, len(boards))
+
+def bench_realign(config, move_lists):
+    boards = [game.board for game in positions(config, move_lists[:5])]
+    def run():
+        # Realigning changes a board, so each operation includes copying it
+        for board in boards:
+            board.copy().realign(-1, -1)
+    return (run, len(boards))
+
+def bench_show(config, move_lists):
+    boards = [game.board for game in positions(config, move_lists[:5])]
+    def run():
+        for board in boards:
+            board.show(leaves_console.tilemap)
+    return (run, len(boards))
+
+def bench_random_game(config, move_lists):
+    game = leaves.Game(*config)
+    def run():
+        rng = random.Random(len(move_lists))
+        for _ in range(5):
+            game.reset()
+            while not game.is_over:
+                game.apply_move(*rng.choice(list(game.legal_moves())))
+    return (run, 5)
+
+def bench_console_status(config, move_lists):
+    games = [game for game in positions(config, move_lists[:5]) if not game.is_over]
+    def run():
+        for game in games:
+            leaves_console.text_status(game)
+    return (run, len(games))
+
+@cache
+def _pygame_window():
+    """Open the (headless) pygame window and font used to render frames."""
+    import pygame
+    pygame.init()
+    return (pygame.display.set_mode((1280, 720)), pygame.font.SysFont("monospace", 24))
+
+def bench_pygame_frame(config, move_lists):
+    import leaves_pygame
+    (win,font) = _pygame_window()
+    games = positions(config, move_lists[:2])
+    def run():
+        for game in games:
+            leaves_pygame.draw_frame(win, font, game)
+    return (run, len(games))
+
+BENCHMARKS = {
+    'make_move': bench_make_move,
+    'check_move': bench_check_move,
+    'pruned': bench_pruned,
+    'counts': bench_counts,
+    'realign': bench_realign,
+    'show': bench_show,
+    'random_game': bench_random_game,
+    'console_status': bench_console_status,
+    'pygame_frame': bench_pygame_frame,
+}
+"""Benchmarks by name, each taking (config, move_lists) and preparing a function to time and how many operations it does."""
+
+def _time(run, number):
+    """Return how many seconds some runs of a function take."""
+    start = time.perf_counter()
+    for _ in range(number):
+        run()
+    return time.perf_counter() - start
+
+def run_benchmarks(names=None, configs=CONFIGS, seed=0, repeat=3):
+    """Run benchmarks for some configurations, returning a list of result dicts.
+
+    Each result has the benchmark 'name', its 'config', the 'ops' done and the
+    best 'seconds' per run and 'ops_per_second' out of `repeat` timings.
+    """
+    if names is None:
+        names = list(BENCHMARKS)
+    if 'pygame_frame' in names:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        try:
+            import pygame
+        except ImportError:
+            print("pygame is not installed, skipping pygame_frame")
+            names = [name for name in names if name != 'pygame_frame']
+    results = []
+    for config in configs:
+        move_lists = random_games(config, seed)
+        for name in names:
+            (run,ops) = BENCHMARKS[name](config, move_lists)
+            # Find how many runs take long enough to time reliably
+            number = 1
+            while _time(run, number) < MIN_SECONDS:
+                number *= 2
+            best = min(_time(run, number) for _ in range(repeat)) / number
+            results.append({
+                'name': name,
+                'config': list(config),
+                'ops': ops,
+                'seconds': best,
+                'ops_per_second': ops / best if best else 0.0,
+            })
+    return results
+
+def compare(results, baseline, tolerance=0.1):
+    """Return (result,baseline result,ratio) for every benchmark in both, and whether none got slower than the tolerance allows."""
+    baseline = { (result['name'],tuple(result['config'])):result for result in baseline }
+    comparisons = []
+    ok = True
+    for result in results:
+        base = baseline.get((result['name'],tuple(result['config'])))
+        if base is None or not base['ops_per_second']:
+            continue
+        ratio = result['ops_per_second'] / base['ops_per_second']
+        ok &= ratio >= 1 - tolerance
+        comparisons.append((result,base,ratio))
+    return (comparisons,ok)
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the leaves engine and frontends.")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the random games")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark, the fastest counts")
+    parser.add_argument('--json', help="file to write the results to")
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed slowdown relative to the baseline")
+    args = parser.parse_args()
+    results = run_benchmarks(args.only, seed=args.seed, repeat=args.repeat)
+    for result in results:
+        print(f"{result['name']:<16}{str(tuple(result['config'])):<14}{result['ops_per_second']:>14.1f} ops/s")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            (comparisons,ok) = compare(results, json.load(file), args.tolerance)
+        print("Compared to baseline:")
+        for (result,_,ratio) in comparisons:
+            print(f"{result['name']:<16}{str(tuple(result['config'])):<14}{ratio:>8.2f}x{'' if ratio >= 1 - args.tolerance else '  SLOWER'}")
+        if not ok:
+            sys.exit(1)
+    return
+
+if __name__=="__main__": main()
+
+# END   MAIN
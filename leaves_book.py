@@ -0,0 +1,216 @@
+# BEGIN OUTLINE
+"""
+This script contains opening books for `leaves.Game`s, built from self-play or archived games.
+
+A book collects, for every position of the first few turns, how often each
+move was played and how well the player making it did in the end (1 for a
+win, shared on draws). Positions equal up to rotation are merged by keying
+them with `leaves.Game.canonical_key`. Books are stored in an open-addressing
+hash table on disk (laid out by `leaves_table`) that is read through `mmap`,
+so lookups take constant time.
+
+File layout (all integers little-endian):
+    - Header: magic b'LVOB', format version (u16), log_pieces (u16), players (u16),
+      pieces_per_player (u16), turns (u16), number of slots (u64, a power of two),
+      number of positions (u64)
+    - Slots: canonical key (u64, 0 for an empty slot), index of the position's
+      first move entry (u32), number of move entries (u32)
+    - Move entries: move in the canonical rotation (u8, `direction << 6 | offset`),
+      games played (u32), summed results (f32)
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+from collections import namedtuple # Lookup results
+import mmap # Constant time lookups into book files
+import random # Seeding self-play
+import struct # Packing headers, slots and entries
+import leaves
+import leaves_notation
+import leaves_table
+import leaves_tournament
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+MAGIC = b'LVOB'
+"""Bytes every book file starts with."""
+
+VERSION = 2
+"""Version of the book format written."""
+
+TURNS = 4
+"""Positions with fewer turns played than this go into a book by default (those the console explains moves for)."""
+
+_HEADER = struct.Struct('<4sHHHHHQQ')
+_SLOT = struct.Struct('<QII')
+_ENTRY = struct.Struct('<BIf')
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+BookMove = namedtuple('BookMove', ['move', 'games', 'score'])
+"""A move of a book position, how many games it was played in, and the average result of its player (0 to 1)."""
+
+class BookBuilder:
+    """Aggregate move statistics of games of one configuration for an opening book."""
+    def __init__(self, log_pieces=5, players=2, pieces_per_player=10, turns=TURNS):
+        self._game = leaves.Game(log_pieces, players, pieces_per_player)
+        self.turns = turns
+        self.positions = dict() # Canonical key -> { move in canonical rotation:[games, summed results] }
+
+    @property
+    def config(self):
+        """(log_pieces,players,pieces_per_player) of the games in the book."""
+        game = self._game
+        return (game.log_pieces, game.players, game.pieces_per_player)
+
+    def add(self, moves):
+        """Add a finished game, given as `leaves.Game`, list of (offset,direction) moves or list of moves in game notation."""
+        if isinstance(moves, leaves.Game):
+            moves = moves.current_move_history
+        game = self._game
+        game.reset()
+        if moves and isinstance(moves[0], str):
+            leaves_notation.play(game, moves)
+        else:
+            for move in moves:
+                game.make_move(*move)
+        if not game.is_over:
+            raise ValueError("only finished games can be added to a book")
+        winners = game.compute_winners()
+        # Go back through the opening, crediting each move to its player
+        played = game.current_move_history[:self.turns]
+        for _ in range(game.current_turn_number - len(played)):
+            game.unmake_move()
+        for move in reversed(played):
+            game.unmake_move()
+            player = game.current_turn[0]
+            keys = game.symmetric_keys()
+            key = min(keys)
+            move = leaves.rotate_move(move, keys.index(key), game.current_board_size)
+            stats = self.positions.setdefault(key, dict()).setdefault(move, [0, 0.0])
+            stats[0] += 1
+            stats[1] += 1 / len(winners) if player in winners else 0.0
+        return
+
+    def write(self, path, min_games=1):
+        """Write the positions with moves played in at least `min_games` games to a book file, returning how many were written."""
+        positions = []
+        for (key,moves) in self.positions.items():
+            moves = sorted(((move,games,results) for (move,(games,results)) in moves.items() if games >= min_games),
+                           key=lambda entry: -entry[1])
+            if moves:
+                positions.append((key,moves))
+        # Move entries of each position follow each other in the order of the positions
+        (slots,entries,entry_count) = ([], bytearray(), 0)
+        for (key,moves) in positions:
+            slots.append((key, entry_count, len(moves)))
+            for (move,games,results) in moves:
+                entries += _ENTRY.pack(leaves_table.pack_move(move), games, results)
+            entry_count += len(moves)
+        table = leaves_table.build_table(_SLOT, slots)
+        with open(path, 'wb') as file:
+            file.write(_HEADER.pack(MAGIC, VERSION, *self.config, self.turns, leaves_table.table_slots(len(positions)), len(positions)))
+            file.write(table)
+            file.write(entries)
+        return len(positions)
+
+class Book:
+    """Read-only constant time lookups into an opening book file, to be used as context manager (or closed explicitly)."""
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic,version,log_pieces,players,pieces_per_player,turns,slots,positions) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} leaves opening book")
+        self._config = (log_pieces, players, pieces_per_player)
+        self._turns = turns
+        self._slots = slots
+        self._entries = _HEADER.size + slots*_SLOT.size
+        self._positions = positions
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Release the memory map of the file."""
+        self._map.close()
+        return
+
+    @property
+    def config(self):
+        """(log_pieces,players,pieces_per_player) of the games in the book."""
+        return self._config
+
+    @property
+    def turns(self):
+        """Positions with fewer turns played than this can be in the book."""
+        return self._turns
+
+    def __len__(self):
+        """How many positions are stored."""
+        return self._positions
+
+    def lookup(self, game):
+        """Return the `BookMove`s of a position, most played first (empty if it is not in the book)."""
+        if ((game.log_pieces, game.players, game.pieces_per_player) != self._config
+                or game.current_turn_number >= self._turns or game.is_over):
+            return []
+        keys = game.symmetric_keys()
+        key = min(keys)
+        values = leaves_table.probe(self._map, _HEADER.size, _SLOT, self._slots, key)
+        if values is None:
+            return []
+        (first,count) = values
+        rotation = keys.index(key)
+        moves = []
+        for n in range(first, first + count):
+            (move,games,results) = _ENTRY.unpack_from(self._map, self._entries + n*_ENTRY.size)
+            move = game.from_canonical_move(leaves_table.unpack_move(move), rotation)
+            moves.append(BookMove(move, games, results / games))
+        return moves
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def build_book(path, games, log_pieces=5, players=2, pieces_per_player=10, turns=TURNS, min_games=1):
+    """Build an opening book file from finished games (see `BookBuilder.add`), returning the number of positions written.
+
+    Games can come from self-play (`self_play`) or archives, e.g.
+    `leaves_notation.read_archive` or `leaves_archive.Archive`.
+    """
+    builder = BookBuilder(log_pieces, players, pieces_per_player, turns)
+    for game in games:
+        builder.add(game)
+    return builder.write(path, min_games)
+
+def self_play(count, log_pieces=5, players=2, pieces_per_player=10, policy='search', seed=0):
+    """Generate the moves (in game notation) of games a `leaves_tournament` policy plays against itself."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield leaves_tournament.play_match((log_pieces, players, pieces_per_player), (policy,)*players, rng.getrandbits(64))['moves']
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+# No main
+# END   MAIN
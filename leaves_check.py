@@ -0,0 +1,305 @@
+# BEGIN OUTLINE
+"""
+This script checks the `leaves` engines against a plain reference implementation of the rules.
+
+The reference is the original dictionary-backed board: pieces are moved one
+tile at a time and the board is rebuilt whenever it needs realigning. Seeded
+random games are replayed on both. After every move the check compares the
+legal moves, pieces, board size, scores, turn state, board key and connected
+areas. It also compares the game after taking moves back. The same games are
+checked against `leaves_batch` (if numpy is installed), and the results of
+`leaves_solver` and `leaves_perft` are compared with brute force searches of
+the reference.
+
+Usage: python leaves_check.py [--games 20] [--seed 0]
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import argparse # Command line interface
+from collections import Counter # Counting pieces of the reference board
+import random # Seeding games
+import sys # Exit status
+import leaves
+from leaves import Dir
+import leaves_perft
+import leaves_solver
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+CONFIGS = [(5,2,10), (3,3,7), (1,1,5), (4,4,6), (2,2,15)] # (log_pieces,players,pieces_per_player) of checked games
+SOLVER_CONFIGS = [(2,2,2), (3,2,2)] # Small two player configurations to solve by brute force
+PERFT_DEPTH = 4
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+class ReferenceGame:
+    """Straightforward implementation of the rules on a dictionary board, kept simple rather than fast."""
+    def __init__(self, log_pieces=5, players=2, pieces_per_player=10):
+        self.pieces = { (0,y):-1 for y in range(log_pieces) }
+        self.players = players
+        self.remaining_pieces = [pieces_per_player] * players
+        self.current_turn = (0, None)
+        self.turn_number = 0
+
+    def copy(self):
+        """Return an independent copy of the game."""
+        game = ReferenceGame.__new__(ReferenceGame)
+        game.pieces = self.pieces.copy()
+        game.players = self.players
+        game.remaining_pieces = self.remaining_pieces.copy()
+        game.current_turn = self.current_turn
+        game.turn_number = self.turn_number
+        return game
+
+    @property
+    def is_over(self):
+        """Whether all pieces have been played."""
+        return self.current_turn is None
+
+    @property
+    def size(self):
+        """Active (width,height) of the board."""
+        return (1 + max(x for (x,_) in self.pieces), 1 + max(y for (_,y) in self.pieces))
+
+    def legal_moves(self):
+        """List all (offset,direction) moves the current player can make."""
+        if self.is_over:
+            return []
+        (w,h) = self.size
+        directions = list(Dir) if self.current_turn[1] is None else [self.current_turn[1]]
+        return [ (offset,direction)
+                 for direction in directions
+                 for offset in range(h if direction in (Dir.EAST,Dir.WEST) else w) ]
+
+    def make_move(self, offset, direction):
+        """Make a legal move for the current player."""
+        player = self.current_turn[0]
+        (w,h) = self.size
+        ((x,y),(dx,dy)) = {
+            Dir.NORTH: ((offset,0),   ( 0, 1)),
+            Dir.EAST : ((w-1,offset), (-1, 0)),
+            Dir.SOUTH: ((offset,h-1), ( 0,-1)),
+            Dir.WEST : ((0,offset),   ( 1, 0)),
+        }[direction]
+        while (x,y) not in self.pieces:
+            (x,y) = (x + dx, y + dy)
+        moving_piece = player
+        while moving_piece is not None:
+            (moving_piece, self.pieces[(x,y)]) = (self.pieces.get((x,y)), moving_piece)
+            (x,y) = (x + dx, y + dy)
+        min_x = min(x for (x,_) in self.pieces)
+        min_y = min(y for (_,y) in self.pieces)
+        self.pieces = { (x - min_x, y - min_y):piece for ((x,y),piece) in self.pieces.items() }
+        self.remaining_pieces[player] -= 1
+        self.turn_number += 1
+        if sum(self.remaining_pieces) == 0:
+            self.current_turn = None
+        else:
+            next_player = ((self.turn_number + 1) // 2) % self.players
+            self.current_turn = (next_player, None if next_player != player else Dir((direction.value + 1) % 4))
+        return
+
+    def scores(self):
+        """How many pieces of each player are a log or next to one."""
+        attached = Counter(
+            piece for ((x,y),piece) in self.pieces.items()
+            if piece == -1 or any(self.pieces.get((x+dx,y+dy)) == -1 for (dx,dy) in ((1,0),(0,1),(-1,0),(0,-1))) )
+        attached.pop(-1, None)
+        return dict(attached)
+
+    def area_sizes(self, piece, attached=False):
+        """Sizes of the connected areas of a piece type, largest first (only those touching a log if `attached`)."""
+        (sizes,seen) = ([], set())
+        for (coordinate,other) in self.pieces.items():
+            if other != piece or coordinate in seen:
+                continue
+            (area,stack) = ({coordinate}, [coordinate])
+            while stack:
+                (x,y) = stack.pop()
+                for neighbor in ((x+1,y),(x-1,y),(x,y+1),(x,y-1)):
+                    if self.pieces.get(neighbor) == piece and neighbor not in area:
+                        area.add(neighbor)
+                        stack.append(neighbor)
+            seen |= area
+            if not attached or any(self.pieces.get((x+dx,y+dy)) == -1 for (x,y) in area for (dx,dy) in ((0,0),(1,0),(0,1),(-1,0),(0,-1))):
+                sizes.append(len(area))
+        return sorted(sizes, reverse=True)
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def _expect(condition, message):
+    """Fail a check with some message unless a condition holds."""
+    if not condition:
+        raise AssertionError(message)
+    return
+
+def _snapshot(game):
+    """Everything about a game's state that taking back moves has to restore."""
+    areas = [game.board.area_sizes(piece, attached) for piece in range(-1, game.players) for attached in (False, True)]
+    return (game.board.pieces, game.current_board_size, game.current_turn, game.remaining_pieces, game.scores(), game.position_key, areas)
+
+def _compare(game, reference, where):
+    """Check that a `leaves.Game` is in the same state as a `ReferenceGame`."""
+    _expect(game.board.pieces == reference.pieces, f"{where}: pieces differ")
+    _expect(game.current_board_size == reference.size, f"{where}: board size {game.current_board_size} != {reference.size}")
+    _expect(game.current_turn == reference.current_turn, f"{where}: turn {game.current_turn} != {reference.current_turn}")
+    _expect(game.remaining_pieces == reference.remaining_pieces, f"{where}: pieces left differ")
+    _expect(game.scores() == reference.scores(), f"{where}: scores {game.scores()} != {reference.scores()}")
+    _expect(game.board.key == leaves._Board(reference.pieces).key, f"{where}: board key differs from a fresh board's")
+    for piece in range(-1, reference.players):
+        for attached in (False, True):
+            _expect(game.board.area_sizes(piece, attached) == reference.area_sizes(piece, attached), f"{where}: area sizes of {piece} differ")
+            _expect(game.board.area_count(piece, attached) == len(reference.area_sizes(piece, attached)), f"{where}: area count of {piece} differs")
+    _expect(sorted(game.legal_moves(), key=str) == sorted(reference.legal_moves(), key=str), f"{where}: legal moves differ")
+    return
+
+def check_game(config, seed):
+    """Replay a seeded random game on a `leaves.Game` and a `ReferenceGame`, also taking back moves, returning how many moves were made."""
+    rng = random.Random(seed)
+    (game,reference) = (leaves.Game(*config), ReferenceGame(*config))
+    snapshots = []
+    while not reference.is_over:
+        where = f"game {config} seed {seed} turn {reference.turn_number}"
+        _compare(game, reference, where)
+        snapshots.append(_snapshot(game))
+        move = rng.choice(reference.legal_moves())
+        _expect(game.check_move(*move) == "", f"{where}: {move} rejected")
+        game.make_move(*move)
+        reference.make_move(*move)
+        # Take the move back and make it again now and then
+        if rng.random() < 0.25:
+            game.unmake_move()
+            _expect(_snapshot(game) == snapshots[-1], f"{where}: unmaking {move} did not restore the game")
+            game.make_move(*move)
+    _compare(game, reference, f"game {config} seed {seed} end")
+    _expect(game.is_over and sorted(game.compute_winners()) == sorted(
+        player for (player,score) in reference.scores().items() if score == max(reference.scores().values())),
+        f"game {config} seed {seed}: winners differ")
+    for snapshot in reversed(snapshots):
+        game.unmake_move()
+        _expect(_snapshot(game) == snapshot, f"game {config} seed {seed}: unmaking all moves did not restore the game")
+    return reference.turn_number
+
+def check_batch(config, seed, games):
+    """Play seeded random moves on a `leaves_batch.BatchGame` and on `ReferenceGame`s (needs numpy)."""
+    import numpy as np
+    import leaves_batch
+    rng = np.random.default_rng(seed)
+    batch = leaves_batch.BatchGame(games, *config)
+    references = [ReferenceGame(*config) for _ in range(games)]
+    while not batch.is_over.all():
+        (offsets,directions) = batch.random_moves(rng)
+        batch.step(offsets, directions)
+        (widths,heights) = batch.current_board_size
+        for (i,reference) in enumerate(references):
+            where = f"batch {config} seed {seed} game {i} turn {reference.turn_number}"
+            move = (int(offsets[i]), Dir(int(directions[i])))
+            _expect(move in reference.legal_moves(), f"{where}: illegal move {move}")
+            reference.make_move(*move)
+            _expect(batch.pieces(i) == reference.pieces, f"{where}: pieces differ")
+            _expect((int(widths[i]), int(heights[i])) == reference.size, f"{where}: board size differs")
+    scores = batch.scores()
+    for (i,reference) in enumerate(references):
+        _expect([reference.scores().get(player, 0) for player in range(config[1])] == list(scores[i]),
+                f"batch {config} seed {seed} game {i}: scores differ")
+    return games
+
+def _minimax(reference):
+    """Score difference (first minus second player) of a two player `ReferenceGame` under perfect play."""
+    if reference.is_over:
+        scores = reference.scores()
+        return scores.get(0, 0) - scores.get(1, 0)
+    sign = 1 if reference.current_turn[0] == 0 else -1
+    values = []
+    for move in reference.legal_moves():
+        child = reference.copy()
+        child.make_move(*move)
+        values.append(sign * _minimax(child))
+    return sign * max(values)
+
+def check_solver(config, seed, positions):
+    """Compare `leaves_solver.Solver` with a brute force minimax of the reference in seeded random positions of a two player configuration."""
+    rng = random.Random(seed)
+    solver = leaves_solver.Solver()
+    for _ in range(positions):
+        (game,reference) = (leaves.Game(*config), ReferenceGame(*config))
+        for _ in range(rng.randrange(config[1] * config[2])):
+            move = rng.choice(reference.legal_moves())
+            game.make_move(*move)
+            reference.make_move(*move)
+        solution = solver.solve(game)
+        where = f"solver {config} seed {seed} turn {reference.turn_number}"
+        _expect(solution.scores[0] - solution.scores[1] == _minimax(reference), f"{where}: solved value differs")
+        if solution.move is not None:
+            _expect(solution.move in reference.legal_moves(), f"{where}: illegal move {solution.move}")
+    return positions
+
+def _reference_perft(reference, depth):
+    """Count the leaf positions below a `ReferenceGame` up to some depth."""
+    if depth == 0 or reference.is_over:
+        return 1
+    count = 0
+    for move in reference.legal_moves():
+        child = reference.copy()
+        child.make_move(*move)
+        count += _reference_perft(child, depth-1)
+    return count
+
+def check_perft(config, depth):
+    """Compare `leaves_perft.perft` (with and without cache) with counting leaves of the reference."""
+    expected = _reference_perft(ReferenceGame(*config), depth)
+    for cache in (False, True):
+        (total,*_) = leaves_perft.perft(leaves.Game(*config), depth, cache)
+        _expect(total == expected, f"perft {config} depth {depth} cache {cache}: {total} != {expected}")
+    return expected
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the Leaves engines against a reference implementation.")
+    parser.add_argument('--games', type=int, default=20, help="random games per configuration")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game")
+    args = parser.parse_args()
+    try:
+        for config in CONFIGS:
+            moves = sum(check_game(config, seed) for seed in range(args.seed, args.seed + args.games))
+            print(f"game   {config}: {args.games} games, {moves} moves ok")
+        try:
+            import numpy # Only needed by the batch engine
+        except ImportError:
+            print("batch: skipped (numpy not installed)")
+        else:
+            for config in CONFIGS:
+                print(f"batch  {config}: {check_batch(config, args.seed, args.games)} games ok")
+        for config in SOLVER_CONFIGS:
+            print(f"solver {config}: {check_solver(config, args.seed, args.games)} positions ok")
+        for config in CONFIGS[:2]:
+            print(f"perft  {config}: depth {PERFT_DEPTH}, {check_perft(config, PERFT_DEPTH)} leaves ok")
+    except AssertionError as error:
+        print(f"FAILED: {error}")
+        sys.exit(1)
+    return
+
+if __name__=="__main__": main()
+
+# END   MAIN
@@ -8,12 +8,16 @@ This script contains a `run` function to play a `leaves.Game` in the console.
 # BEGIN IMPORTS
 
 from leaves_consts import Dir,DIR_DATA,DIR_DATA_ANY,PIECE_DATA,PIECE_DATA_EMPTY
+from leaves_notation import parse_move
 
 # END   IMPORTS
 
 
 # BEGIN CONSTANTS
-# No constants
+
+BAR = f"~:{43*'-'}:~" # Horizontal ASCII bar
+W = len(BAR) # Width of the console interface
+
 # END   CONSTANTS
 
 
@@ -83,11 +87,49 @@ def glueStrs(*strings):
     )
     return string
 
+def tilemap(piece):
+    """Return the console sprite of a board tile."""
+    return (PIECE_DATA_EMPTY if piece is None else PIECE_DATA[piece])[0]
+
+def text_status(game):
+    """Return the text shown in the console at the start of each turn."""
+    (player,direction) = game.current_turn
+    # Show game state
+    (psprite,pname,*_) = PIECE_DATA[player]
+    # Explain moves differently depending on whether direction is predetermined or not
+    if direction is None:
+        (dsprite,dname) = DIR_DATA_ANY
+        text_ex = ( # Example move text
+            alnStr(f'<', dedentStr(f"""
+            -> e.g. 'N1' = from North ↓ in 1st column,
+                    'W4' = from West ⟶  in 4th row, etc.)
+            """))
+        )
+    else:
+        (dsprite,dname) = DIR_DATA[direction]
+        text_ex = ( # Example move text
+            alnStr('<', dedentStr(f"""
+            -> e.g. '1' = from {dsprite} {dname} in 1st {"column" if direction in [Dir.NORTH,Dir.SOUTH] else "row"})
+            """))
+        )
+    text_turn = glueStrs( # Current turn information text
+        alnStr(f'^{W}', dedentStr(f"""
+        {psprite} {pname}
+        {dsprite} {dname}
+        """))
+    )
+    text_status = glueStrs( # Final text to print each turn
+        alnStr('<', BAR),
+        alnStr(f'^{W}', f"Turn {game.current_turn_number}"),
+        alnStr(f'^{W}', text_turn),
+        alnStr(f'^{W}', boxStr(alnStr(f'^{W-4}', game.board.show(tilemap)))),
+        alnStr(f'^{W}', f"[pieces left: {' - '.join(f'{remaining} {PIECE_DATA[player][0]}' for (player,remaining) in enumerate(game.remaining_pieces))}]"),
+        alnStr('<',(text_ex if game.current_turn_number <= 3 else '')),
+    )
+    return text_status
+
 def run(game):
     """Run a `leaves` game in the console."""
-    tilemap = lambda piece: (PIECE_DATA_EMPTY if piece is None else PIECE_DATA[piece])[0] # Use for displaying the board
-    BAR = f"~:{43*'-'}:~" # Horizontal ASCII bar
-    W = len(BAR) # Width of the console interface
     text_title = glueStrs( # Title screen text
         alnStr('', BAR),
         alnStr(f'^{W}', dedentStr(f"""
@@ -100,45 +142,7 @@ def run(game):
     print(text_title)
     while not game.is_over:
         (player,direction) = game.current_turn
-        # Show game state
-        (psprite,pname,*_) = PIECE_DATA[player]
-        # Parse differently depending on whether direction is predetermined or not
-        if direction is None:
-            (dsprite,dname) = DIR_DATA_ANY
-            text_ex = ( # Example move text
-                alnStr(f'<', dedentStr(f"""
-                -> e.g. 'N1' = from North ↓ in 1st column,
-                        'W4' = from West ⟶  in 4th row, etc.)
-                """))
-            )
-            parse = lambda user_input: (
-                int(user_input[1:]) - 1,
-                dict(zip("NESW",list(Dir)))[user_input[0].upper()] )
-        else:
-            (dsprite,dname) = DIR_DATA[direction]
-            text_ex = ( # Example move text
-                alnStr('<', dedentStr(f"""
-                -> e.g. '1' = from {dsprite} {dname} in 1st {"column" if direction in [Dir.NORTH,Dir.SOUTH] else "row"})
-                """))
-            )
-            parse = lambda user_input: (
-                int(user_input) - 1,
-                direction)
-        text_turn = glueStrs( # Current turn information text
-            alnStr(f'^{W}', dedentStr(f"""
-            {psprite} {pname}
-            {dsprite} {dname}
-            """))
-        )
-        text_status = glueStrs( # Final text to print each turn
-            alnStr('<', BAR),
-            alnStr(f'^{W}', f"Turn {game.current_turn_number}"),
-            alnStr(f'^{W}', text_turn),
-            alnStr(f'^{W}', boxStr(alnStr(f'^{W-4}', game.board.show(tilemap)))),
-            alnStr(f'^{W}', f"[pieces left: {' - '.join(f'{remaining} {PIECE_DATA[player][0]}' for (player,remaining) in enumerate(game.remaining_pieces))}]"),
-            alnStr('<',(text_ex if game.current_turn_number <= 3 else '')),
-        )
-        print(text_status)
+        print(text_status(game))
         # Ask user for valid input
         while True:
             try:
@@ -146,7 +150,7 @@ def run(game):
                 if user_input.startswith("sudo "): # Hackerman
                     exec(user_input[5:])
                     continue
-                move = parse(user_input)
+                move = parse_move(user_input, direction)
                 game.make_move(*move)
                 break
             except (KeyboardInterrupt, EOFError):
@@ -44,6 +44,18 @@ PIECE_DATA = {
     3: ("▓▓", "Fourth player", [
           ((0.0,0.0), (1.0,1.0), ct.mix(ct.SALMON,ct.YELLOW,0.25)),
        ]),
+    4: ("▚▚", "Fifth player", [
+          ((0.0,0.0), (1.0,1.0), ct.mix(ct.TURQUOISE,ct.SKY,0.25)),
+       ]),
+    5: ("▞▞", "Sixth player", [
+          ((0.0,0.0), (1.0,1.0), ct.mix(ct.GOLDENROD,ct.ORANGE,0.25)),
+       ]),
+    6: ("▙▟", "Seventh player", [
+          ((0.0,0.0), (1.0,1.0), ct.mix(ct.CRIMSON,ct.ROSE,0.25)),
+       ]),
+    7: ("▛▜", "Eighth player", [
+          ((0.0,0.0), (1.0,1.0), ct.mix(ct.LIME,ct.TEAL,0.25)),
+       ]),
 }
 """Data dictionary for each player piece variant."""
 
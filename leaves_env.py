@@ -0,0 +1,160 @@
+# BEGIN OUTLINE
+"""
+This script contains a vectorized reinforcement learning environment for `leaves` games.
+
+`VectorEnv` steps a whole `leaves_batch.BatchGame` per call. Observations are
+fixed-shape numpy arrays, seen from the perspective of the player to move:
+    - 'board': (envs, 1 + players, max_height, max_width) planes of the logs and
+      of each player's pieces (current player first), active area top left
+    - 'remaining_pieces': (envs, players) pieces left (current player first)
+    - 'direction': (envs, 5) one-hot of the forced direction (N, E, S, W) or 'any'
+Actions are indices `direction * max_offset + offset` of a padded action space
+covering every line offset a board of this configuration can ever have; the
+valid ones follow the offset rules of `leaves.Game.check_move`.
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import numpy as np
+import leaves_batch
+from leaves_batch import EAST,WEST,NO_DIRECTION
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+# No constants
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+class VectorEnv:
+    def __init__(self, envs, log_pieces=5, players=2, pieces_per_player=10, autoreset=True):
+        self._batch = leaves_batch.BatchGame(envs, log_pieces, players, pieces_per_player)
+        self._autoreset = autoreset
+        self._rng = np.random.default_rng()
+        # Every move makes a board at most one tile wider or higher
+        turns = players * pieces_per_player
+        (self._max_width, self._max_height) = (1 + turns, log_pieces + turns)
+        self._max_offset = max(self._max_width, self._max_height)
+
+    @property
+    def envs(self):
+        """How many games are stepped at once."""
+        return self._batch.games
+
+    @property
+    def action_count(self):
+        """Size of the padded action space."""
+        return 4 * self._max_offset
+
+    @property
+    def observation_shapes(self):
+        """Shapes of the observation arrays (without the leading envs dimension)."""
+        players = self._batch.players
+        return {
+            'board': (1 + players, self._max_height, self._max_width),
+            'remaining_pieces': (players,),
+            'direction': (5,),
+        }
+
+    def encode_action(self, offset, direction):
+        """Action index (or array of indices) of a line offset and direction value."""
+        return direction * self._max_offset + offset
+
+    def decode_action(self, action):
+        """(offset,direction) of an action index (or array of indices)."""
+        (direction,offset) = np.divmod(action, self._max_offset)
+        return (offset,direction)
+
+    def reset(self, seed=None):
+        """Start new games in all environments, returning the first observations."""
+        if seed is not None:
+            self._rng = np.random.default_rng(seed)
+        self._batch.reset()
+        return self.observe()
+
+    def observe(self):
+        """Observations of all environments from the perspective of their current player."""
+        batch = self._batch
+        players = batch.players
+        # Order players starting with the one to move
+        order = (batch.current_player[:,None] + np.arange(players)) % players
+        boards = batch.aligned_boards(self._max_width, self._max_height)
+        planes = np.empty((batch.games, 1 + players, self._max_height, self._max_width), dtype=np.float32)
+        planes[:,0] = boards == 1
+        for plane in range(players):
+            planes[:,1+plane] = boards == (order[:,plane] + 2)[:,None,None]
+        remaining_pieces = np.take_along_axis(batch.remaining_pieces, order, axis=1).astype(np.float32)
+        direction = np.zeros((batch.games, 5), dtype=np.float32)
+        direction[np.arange(batch.games), np.where(batch.current_direction == NO_DIRECTION, 4, batch.current_direction)] = 1
+        return { 'board': planes, 'remaining_pieces': remaining_pieces, 'direction': direction }
+
+    def legal_action_mask(self):
+        """Boolean array (envs, action_count) of which actions are valid in each environment."""
+        batch = self._batch
+        (w,h) = batch.current_board_size
+        offsets = np.arange(self._max_offset)
+        directions = np.arange(4)
+        direction_ok = ((batch.current_direction[:,None] == NO_DIRECTION)
+                        | (batch.current_direction[:,None] == directions))
+        extents = np.where((directions == EAST) | (directions == WEST), h[:,None], w[:,None])
+        mask = direction_ok[:,:,None] & (offsets < extents[:,:,None])
+        mask &= ~batch.is_over[:,None,None]
+        return mask.reshape(batch.games, self.action_count)
+
+    def sample_actions(self):
+        """Array of one random valid action per environment."""
+        (offsets,directions) = self._batch.random_moves(self._rng)
+        return self.encode_action(offsets, directions)
+
+    def step(self, actions):
+        """Make one move in every environment.
+
+        Returns (observations, rewards, dones, info). Rewards are an (envs, players)
+        array that is zero except when a game ends, where winners share a reward
+        of 1. With `autoreset`, finished games are restarted and their final
+        observations and scores are put into `info`.
+        """
+        batch = self._batch
+        actions = np.asarray(actions)
+        active = ~batch.is_over
+        out_of_range = (actions < 0) | (actions >= self.action_count)
+        if out_of_range.any():
+            raise ValueError(f"actions must be in range 0 to {self.action_count - 1} (environments {np.nonzero(out_of_range)[0].tolist()})")
+        legal = self.legal_action_mask()[np.arange(batch.games), actions]
+        if not legal[active].all():
+            raise ValueError(f"invalid actions for environments {np.nonzero(active & ~legal)[0].tolist()}")
+        (offsets,directions) = self.decode_action(actions)
+        batch.step(offsets, directions)
+        # Reward winners of games that just ended
+        dones = batch.is_over
+        finished = active & dones
+        winners = batch.compute_winners()
+        rewards = np.where(finished[:,None], winners / np.maximum(winners.sum(axis=1, keepdims=True), 1), 0.0)
+        info = dict()
+        if self._autoreset and dones.all():
+            info['final_observation'] = self.observe()
+            info['final_scores'] = batch.scores()
+            batch.reset()
+        return (self.observe(), rewards, dones, info)
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+# No functions
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+# No main
+# END   MAIN
@@ -0,0 +1,120 @@
+# BEGIN OUTLINE
+"""
+This script contains opt-in instrumentation for the hot paths of `leaves` and its frontends.
+
+Instrumentation is enabled by setting the environment variable LEAVES_INSTRUMENT
+before the instrumented modules are imported:
+    - LEAVES_INSTRUMENT=1 prints a table of the stats when the process exits
+    - LEAVES_INSTRUMENT=path.json writes them to a JSON file instead
+When it is not set, `instrumented` returns functions unchanged, so there is no
+overhead at all. Stats are kept per name in one registry for the whole process,
+times include the time spent in nested instrumented calls.
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import atexit # Dumping stats when the process exits
+from functools import wraps # Keeping names and docstrings of instrumented functions
+import json # Dumping stats as JSON
+import os # Reading the environment variable
+import sys # Printing stats to stderr
+import time # Measuring calls
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+SETTING = os.environ.get('LEAVES_INSTRUMENT', '')
+"""Value of the LEAVES_INSTRUMENT environment variable at import."""
+
+ENABLED = SETTING not in ('', '0')
+"""Whether functions get instrumented."""
+
+_registry = dict() # Name -> [calls, total seconds, max seconds]
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+
+def instrumented(name):
+    """Count the calls of a function and the time spent in them under some name (only if instrumentation is enabled)."""
+    def decorator(function):
+        if not ENABLED:
+            return function
+        stat = _registry.setdefault(name, [0, 0.0, 0.0])
+        clock = time.perf_counter
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = clock() - start
+                stat[0] += 1
+                stat[1] += seconds
+                if seconds > stat[2]:
+                    stat[2] = seconds
+        return wrapper
+    return decorator
+
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+# No classes
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def stats():
+    """Return the stats of every instrumented name as dict name -> {'calls','seconds','max_seconds','mean_seconds'}."""
+    return { name:{
+                 'calls': calls,
+                 'seconds': seconds,
+                 'max_seconds': max_seconds,
+                 'mean_seconds': seconds / calls if calls else 0.0,
+             }
+             for (name,(calls,seconds,max_seconds)) in sorted(_registry.items()) }
+
+def reset():
+    """Set all stats back to zero."""
+    for stat in _registry.values():
+        stat[:] = [0, 0.0, 0.0]
+    return
+
+def dumps():
+    """Return the stats as JSON string."""
+    return json.dumps(stats(), indent=2)
+
+def table():
+    """Return the stats as text table, sorted by total time."""
+    rows = sorted(stats().items(), key=lambda item: -item[1]['seconds'])
+    width = max((len(name) for (name,_) in rows), default=4)
+    lines = [f"{'name':<{width}} {'calls':>10} {'total ms':>12} {'mean us':>10} {'max us':>10}"]
+    for (name,stat) in rows:
+        lines.append(f"{name:<{width}} {stat['calls']:>10} {stat['seconds']*1e3:>12.2f} {stat['mean_seconds']*1e6:>10.2f} {stat['max_seconds']*1e6:>10.2f}")
+    return '\n'.join(lines)
+
+def _dump_at_exit():
+    """Write the stats where the environment variable says."""
+    if SETTING.endswith('.json'):
+        with open(SETTING, 'w') as file:
+            file.write(dumps())
+    else:
+        print(table(), file=sys.stderr)
+    return
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+
+if ENABLED:
+    atexit.register(_dump_at_exit)
+
+# END   MAIN
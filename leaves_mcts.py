@@ -0,0 +1,158 @@
+# BEGIN OUTLINE
+"""
+This script contains a Monte Carlo Tree Search engine to pick moves for a `leaves.Game`.
+
+Unlike `leaves_search`, the tree search keeps a reward for every player in
+each node (each player picks the move best for themselves), so it handles any
+number of players. Random playouts are spread over several processes with
+root parallelization: every worker grows its own tree from the same position,
+and the per-move statistics of all trees are summed up at the end.
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+from collections import namedtuple # Search results
+from concurrent.futures import ProcessPoolExecutor # Running playouts on all cores
+import math # Upper confidence bounds
+import os # Counting cores
+import random # Random playouts
+import time # Measuring throughput
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+EXPLORATION = math.sqrt(2)
+"""Default exploration constant of the upper confidence bound."""
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+MoveStats = namedtuple('MoveStats', ['visits', 'reward'])
+"""How often a root move was visited and its mean reward for the player making it."""
+
+MCTSResult = namedtuple('MCTSResult', ['move', 'stats', 'playouts', 'seconds', 'playouts_per_second'])
+"""Most visited move, `MoveStats` for every root move and search statistics."""
+
+class _Node:
+    """Node of the search tree, holding statistics of the position reached by a move."""
+    __slots__ = ('player', 'children', 'untried', 'visits', 'rewards')
+
+    def __init__(self, game):
+        self.player = None if game.is_over else game.current_turn[0] # Who picks a move here
+        self.children = dict()
+        self.untried = list(game.legal_moves())
+        self.visits = 0
+        self.rewards = [0.0] * game.players
+
+    def select(self, exploration):
+        """Child move with the highest upper confidence bound for the player to move."""
+        log_visits = math.log(self.visits)
+        def ucb(item):
+            (_,child) = item
+            return (child.rewards[self.player] / child.visits
+                    + exploration * math.sqrt(log_visits / child.visits))
+        return max(self.children.items(), key=ucb)
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def _rewards(game):
+    """Reward of each player at the end of a game: winners share a reward of 1."""
+    winners = game.compute_winners()
+    rewards = [0.0] * game.players
+    for winner in winners:
+        rewards[winner] = 1 / len(winners)
+    return rewards
+
+def _grow_tree(game, playouts, seed, exploration):
+    """Run a number of playouts from a position, returning (visits,total reward) per root move."""
+    rng = random.Random(seed)
+    root = _Node(game)
+    for _ in range(playouts):
+        (node,path,made) = (root,[root],0)
+        # Selection: follow best children while the node is fully expanded
+        while not node.untried and node.children:
+            (move,node) = node.select(exploration)
+            game.apply_move(*move)
+            path.append(node)
+            made += 1
+        # Expansion: add one untried move
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            game.apply_move(*move)
+            made += 1
+            node.children[move] = child = _Node(game)
+            path.append(child)
+        # Simulation: play randomly until the game is over
+        while not game.is_over:
+            game.apply_move(*rng.choice(list(game.legal_moves())))
+            made += 1
+        rewards = _rewards(game)
+        # Backpropagation
+        for node in path:
+            node.visits += 1
+            for (player,reward) in enumerate(rewards):
+                node.rewards[player] += reward
+        for _ in range(made):
+            game.unmake_move()
+    return { move:(child.visits, child.rewards[root.player])
+             for (move,child) in root.children.items() }
+
+def mcts(game, playouts=10000, workers=None, seed=None, exploration=EXPLORATION, executor=None):
+    """Find the best move for the current player of a game with parallel Monte Carlo Tree Search.
+
+    The `playouts` are split evenly over `workers` processes (default: one per
+    core), or run in this process if `workers` is 1. An existing
+    `concurrent.futures.Executor` can be passed to avoid starting new processes.
+    """
+    if game.is_over:
+        raise ValueError("game is over, no moves to search")
+    if playouts < 1:
+        raise ValueError(f"at least one playout is needed to pick a move, not {playouts}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    rng = random.Random(seed)
+    shares = [playouts // workers + (i < playouts % workers) for i in range(workers)]
+    seeds = [rng.getrandbits(64) for _ in range(workers)]
+    start = time.perf_counter()
+    if workers == 1 and executor is None:
+        trees = [_grow_tree(game.clone(), shares[0], seeds[0], exploration)]
+    else:
+        # Every tree gets its own copy of the game, as threads would otherwise make moves on the same one
+        games = [game.clone() for _ in range(workers)]
+        if executor is not None:
+            trees = list(executor.map(_grow_tree, games, shares, seeds, [exploration]*workers))
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                trees = list(executor.map(_grow_tree, games, shares, seeds, [exploration]*workers))
+    seconds = time.perf_counter() - start
+    # Merge statistics of all trees
+    totals = dict()
+    for tree in trees:
+        for (move,(visits,reward)) in tree.items():
+            (total_visits,total_reward) = totals.get(move, (0,0.0))
+            totals[move] = (total_visits + visits, total_reward + reward)
+    stats = { move:MoveStats(visits, reward / visits)
+              for (move,(visits,reward)) in totals.items() }
+    best_move = max(stats, key=lambda move: (stats[move].visits, stats[move].reward))
+    return MCTSResult(best_move, stats, playouts, seconds, playouts / seconds if seconds else 0.0)
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+# No main
+# END   MAIN
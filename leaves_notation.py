@@ -0,0 +1,129 @@
+# BEGIN OUTLINE
+"""
+This script contains functions to read and write `leaves.Game`s in game notation.
+
+A move is written as its 1-based line offset, preceded by the first letter of
+its direction if the player could choose it (e.g. 'N1', 'W4'), or on its own
+if the direction was forced (e.g. '3'), as in `leaves.Game.current_turn_history`.
+A game is a sequence of moves separated by whitespace. Archives hold many
+games, separated by blank lines (or one game per line), and can be replayed
+lazily one game at a time. Lines starting with '#' are ignored.
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import leaves
+from leaves import Dir
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+DIR_LETTERS = { direction.name[0]:direction for direction in Dir }
+"""Direction of each letter used in game notation."""
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+# No classes
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def parse_move(text, direction=None):
+    """Read a move in game notation into (offset,direction), given the direction forced by the current turn (if any)."""
+    text = text.strip()
+    if text[:1].upper() in DIR_LETTERS:
+        (direction,text) = (DIR_LETTERS[text[0].upper()], text[1:])
+    elif direction is None:
+        raise ValueError(f"move {text!r} needs a direction (one of {', '.join(DIR_LETTERS)})")
+    return (int(text) - 1, direction)
+
+def format_move(offset, new_direction, direction=None):
+    """Write a move in game notation, given the direction forced by the current turn (if any)."""
+    return f"{(new_direction.name[0] if direction is None else '')}{offset+1}"
+
+def play(game, moves):
+    """Make a sequence of moves in game notation on a game."""
+    for (turn,text) in enumerate(moves, start=1):
+        if game.is_over:
+            raise ValueError(f"move {turn} {text!r}: game is over, no moves allowed")
+        (offset,new_direction) = parse_move(text, game.current_turn[1])
+        err = game.check_move(offset, new_direction)
+        if err:
+            raise ValueError(f"move {turn} {text!r}: {err}")
+        game.apply_move(offset, new_direction)
+    return game
+
+def loads(text, log_pieces=5, players=2, pieces_per_player=10):
+    """Read a game in game notation into a new `leaves.Game`."""
+    return play(leaves.Game(log_pieces, players, pieces_per_player), text.split())
+
+def dumps(game):
+    """Write the moves made in a game in game notation, one per line."""
+    return game.current_turn_history
+
+def read_archive(lines, per_line=False):
+    """Generate the move lists of the games in an archive, reading it lazily.
+
+    Games are separated by blank lines, or are one per line if `per_line` is set.
+    """
+    moves = []
+    for line in lines:
+        if line.lstrip().startswith('#'):
+            continue
+        tokens = line.split()
+        if per_line:
+            if tokens:
+                yield tokens
+        elif tokens:
+            moves.extend(tokens)
+        elif moves:
+            yield moves
+            moves = []
+    if moves:
+        yield moves
+
+def write_archive(file, games):
+    """Write games (or move lists in game notation) to an archive file, separated by blank lines."""
+    for game in games:
+        moves = game if isinstance(game, list) else game.current_turn_history.split()
+        file.write('\n'.join(moves))
+        file.write('\n\n')
+    return
+
+def replay_archive(file, log_pieces=5, players=2, pieces_per_player=10, per_line=False):
+    """Replay every game of an archive (a path or open text file), generating the game after its last move.
+
+    Games are read lazily and the same `leaves.Game` instance is reset for each
+    of them, so only one game is in memory at a time; `clone` it to keep one.
+    """
+    if isinstance(file, str):
+        with open(file) as opened_file:
+            yield from replay_archive(opened_file, log_pieces, players, pieces_per_player, per_line)
+        return
+    game = leaves.Game(log_pieces, players, pieces_per_player)
+    for (index,moves) in enumerate(read_archive(file, per_line)):
+        game.reset()
+        try:
+            play(game, moves)
+        except ValueError as e:
+            raise ValueError(f"archived game {index}: {e}") from None
+        yield game
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+# No main
+# END   MAIN
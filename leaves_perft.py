@@ -0,0 +1,119 @@
+# BEGIN OUTLINE
+"""
+This script counts the leaf positions of the `leaves.Game` move tree to some depth (perft).
+
+Every move is made and taken back, so the counts check the move generator and
+the make/unmake logic, and the speed is a benchmark for them. Positions where
+the game ended before reaching the depth count as leaves. Subtrees of equal
+positions can be counted once with a cache keyed by `leaves.Game.position_key`,
+and the subtrees of the first moves can be counted in parallel processes.
+
+Usage: python leaves_perft.py DEPTH [--logs 5] [--players 2] [--pieces 10] [--cache] [--workers N] [--divide]
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import argparse # Command line interface
+from concurrent.futures import ProcessPoolExecutor # Counting subtrees in parallel
+import time # Measuring speed
+import leaves
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+# No constants
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+class Perft:
+    """Leaf counter keeping track of how many moves it made, with an optional cache of subtree counts."""
+    def __init__(self, cache=False):
+        self.cache = dict() if cache else None
+        self.nodes = 0
+
+    def count(self, game, depth):
+        """Count the leaf positions below a position up to some depth."""
+        if depth == 0 or game.is_over:
+            return 1
+        if self.cache is not None:
+            key = (game.position_key, depth)
+            if key in self.cache:
+                return self.cache[key]
+        leaves_count = 0
+        for move in list(game.legal_moves()):
+            game.apply_move(*move)
+            self.nodes += 1
+            leaves_count += self.count(game, depth-1)
+            game.unmake_move()
+        if self.cache is not None:
+            self.cache[key] = leaves_count
+        return leaves_count
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def _count_subtree(game, move, depth, cache):
+    """Count the leaf positions below a move, returning (leaves,nodes)."""
+    perft = Perft(cache)
+    game.apply_move(*move)
+    return (perft.count(game, depth-1), perft.nodes + 1)
+
+def perft(game, depth, cache=False, workers=1):
+    """Count the leaf positions of a game up to some depth.
+
+    Returns (total leaves, leaves per first move, nodes made, seconds). With more
+    than one worker, the subtrees of the first moves are counted in parallel
+    processes (each with its own cache).
+    """
+    start = time.perf_counter()
+    moves = list(game.legal_moves())
+    if depth == 0 or not moves:
+        return (1, dict(), 0, time.perf_counter() - start)
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            counts = list(executor.map(_count_subtree, [game]*len(moves), moves, [depth]*len(moves), [cache]*len(moves)))
+    else:
+        counts = [_count_subtree(game.clone(), move, depth, cache) for move in moves]
+    divide = { move:leaves_count for (move,(leaves_count,_)) in zip(moves, counts) }
+    nodes = sum(nodes for (_,nodes) in counts)
+    return (sum(divide.values()), divide, nodes, time.perf_counter() - start)
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the leaf positions of the Leaves move tree up to some depth.")
+    parser.add_argument('depth', type=int, help="how many moves deep to count")
+    parser.add_argument('--logs', type=int, default=5, help="log pieces of the game")
+    parser.add_argument('--players', type=int, default=2, help="players of the game")
+    parser.add_argument('--pieces', type=int, default=10, help="pieces per player of the game")
+    parser.add_argument('--cache', action='store_true', help="count subtrees of equal positions only once")
+    parser.add_argument('--workers', type=int, default=1, help="processes to split the first moves across")
+    parser.add_argument('--divide', action='store_true', help="show the leaf count below each first move")
+    args = parser.parse_args()
+    game = leaves.Game(log_pieces=args.logs, players=args.players, pieces_per_player=args.pieces)
+    (total,divide,nodes,seconds) = perft(game, args.depth, cache=args.cache, workers=args.workers)
+    if args.divide:
+        for ((offset,direction),leaves_count) in divide.items():
+            print(f"{direction.name[0]}{offset+1}: {leaves_count}")
+    print(f"perft({args.depth}) = {total}")
+    print(f"{nodes} nodes in {seconds:.3f}s = {nodes/seconds if seconds else 0:.0f} nodes/s")
+    return
+
+if __name__=="__main__": main()
+
+# END   MAIN
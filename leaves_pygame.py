@@ -9,13 +9,16 @@ This script contains a `run` function to play a `leaves.Game` in a pygame widget
 
 import pygame
 import colortools as ct
+from leaves_instrument import instrumented
 from leaves_consts import Dir,DIR_DATA,DIR_DATA_ANY,PIECE_DATA,PIECE_DATA_EMPTY
 
 # END   IMPORTS
 
 
 # BEGIN CONSTANTS
-# No constants
+
+TEXT_RATIO = 5 # Split remaining vertical space into equal sections for texts
+
 # END   CONSTANTS
 
 
@@ -31,6 +34,178 @@ from leaves_consts import Dir,DIR_DATA,DIR_DATA_ANY,PIECE_DATA,PIECE_DATA_EMPTY
 
 # BEGIN FUNCTIONS
 
+@instrumented('pygame.input')
+def read_input():
+    """Return the sets of (events,keys,mods) sensed since the last frame."""
+    # Process input
+    events = set() # List of events to be used later
+    keys   = set() # List of pressed keys
+    mods   = set() # List of pressed key modifiers
+    for event in pygame.event.get():
+        # Add to sensed key presses
+        if event.type == pygame.KEYDOWN:
+            keys.add(event.key)
+        else:
+            events.add(event.type)
+    flags_set = pygame.key.get_mods()
+    for flag in [pygame.KMOD_CTRL,pygame.KMOD_SHIFT,pygame.KMOD_ALT]:
+        # Add to sense key modifiers
+        if flag & flags_set:
+            mods.add(flag)
+    return (events,keys,mods)
+
+@instrumented('pygame.layout')
+def layout(size, board_size):
+    """Return the window margin and the frame ((xf0,yf0),(xf1,yf1)) within which to draw a board of some size."""
+    # Figure out basic margin for board drawing
+    # -> "(x|y)m(0|1)" are the (row|column) margin (start|end) coordinates
+    (W,H) = size
+    (gameW,gameH) = board_size
+    fraction = 0.70
+    win_mrg = int( min(W,H)/2 * (1-fraction) )
+    ((xm0,ym0), (xm1,ym1)) = ((win_mrg,win_mrg), (W-win_mrg,H-win_mrg))
+
+    # Figure out exact frame within which to draw game
+    # -> "(x|y)f(0|1)" are the (row|column) game board frame (start|end) coordinates
+    # Game board has wider aspect ratio than allowed frame:
+    if ((xm1-xm0)/(ym1-ym0)) <= gameW/gameH:
+        sidemrg = int( ((ym1-ym0) - gameH * (xm1-xm0)/gameW) / 2 )
+        ((xf0,yf0), (xf1,yf1)) = ((xm0,ym0+sidemrg), (xm1,ym1-sidemrg))
+    # Game board has lower aspect ratio than allowed frame:
+    elif ((xm1-xm0)/(ym1-ym0)) > gameW/gameH:
+        sidemrg = int( ((xm1-xm0) - gameW * (ym1-ym0)/gameH) / 2 )
+        ((xf0,yf0), (xf1,yf1)) = ((xm0+sidemrg,ym0), (xm1-sidemrg,ym1))
+    return (win_mrg, ((xf0,yf0), (xf1,yf1)))
+
+def select_line(mouse_pos, frame, board_size):
+    """Return the (line,direction) a mouse position selects around the frame, or (None,None)."""
+    (xms,yms) = mouse_pos
+    ((xf0,yf0), (xf1,yf1)) = frame
+    (gameW,gameH) = board_size
+    # Mouse is on vertical sides:
+    if (xms <= xf0 or xf1 <= xms) and yf0 <= yms <= yf1:
+        sel_line = int((yms-yf0) / (yf1-yf0) * gameH)
+        sel_dir  = Dir.WEST if xms <= xf0 else Dir.EAST
+    # Mouse is on horizontal sides:
+    elif (yms <= yf0 or yf1 <= yms) and xf0 <= xms <= xf1:
+        sel_line = int((xms-xf0) / (xf1-xf0) * gameW)
+        sel_dir  = Dir.NORTH if yms <= yf0 else Dir.SOUTH
+    # Mouse is not selecting a game row or column:
+    else:
+        sel_line = None
+        sel_dir  = None
+    return (sel_line,sel_dir)
+
+def accent_color(game):
+    """Return the color of the current player (gray once the game is over)."""
+    return ct.LIGHT_GRAY if game.is_over else PIECE_DATA[game.current_turn[0]][2][0][2]
+
+@instrumented('pygame.draw')
+def draw_board(win, game, frame, selection=(None,None), show_pruned=False):
+    """Draw the background, the selected line and all board tiles of a game onto a surface."""
+    (W,H) = win.get_size()
+    ((xf0,yf0), (xf1,yf1)) = frame
+    (gameW,gameH) = game.current_board_size
+    (sel_line,sel_dir) = selection
+    # Accent color used
+    accentcol = accent_color(game)
+
+    # Draw background
+    bgcol = ct.mix(ct.mix(accentcol,ct.BLACK,6/8),ct.DARK_GRAY,1/8)
+    win.fill(bgcol)
+
+    # Draw debug.
+    """pygame.draw.rect(win, ct.RED, (xf0-2,yf0-2, 2,2))
+    pygame.draw.rect(win, ct.GREEN, (xf1,yf0-2, 2,2))
+    pygame.draw.rect(win, ct.BLUE, (xf0-2,yf1, 2,2))
+    pygame.draw.rect(win, ct.YELLOW, (xf1,yf1, 2,2))"""
+
+    # Draw selected line
+    tileSz = int((xf1-xf0) / gameW) # Available square length (px) per piece
+    barcol1 = ct.mix(bgcol, ct.mix(ct.WHITE,accentcol,2/8), 0.25) # Low pulse
+    barcol2 = ct.mix(bgcol, ct.mix(ct.WHITE,accentcol,2/8), 0.4) # High pulse
+    rate = 2500 # Blinking rate
+    timeparam = pygame.time.get_ticks()%rate/rate
+    barcol = ct.interpolate([barcol1,barcol2,barcol1],timeparam)
+    # Invalid move: Don't select line
+    if not game.check_move(sel_line,sel_dir) == "":
+        pass
+    # Selected column:
+    elif sel_dir in [Dir.NORTH,Dir.SOUTH]:
+        pygame.draw.rect(win, barcol, (xf0+tileSz*sel_line,0, tileSz,H))
+    # Selected row:
+    elif sel_dir in [Dir.EAST,Dir.WEST]:
+        pygame.draw.rect(win, barcol, (0,yf0+tileSz*sel_line, W,tileSz))
+
+    # Draw all board tiles
+    psize = 0.9 # Scaled piece size (so they dont stick to each other directly)
+    pmarg = tileSz*(1-psize)/2 # Resulting piece margin
+    board = game.board.pruned() if show_pruned else game.board
+    for (xp,yp),piecetype in board.pieces.items():
+        (xa,ya) = (xf0 + xp*tileSz, yf0 + yp*tileSz) # Piece (tile) anchor
+        # Draw each of the piece layers
+        for ((xo,yo),(xl,yl),color) in PIECE_DATA[piecetype][2]:
+            offset_size = (
+                xo*tileSz*psize + pmarg + xa, # Texture offset
+                xo*tileSz*psize + pmarg + ya, #
+                xl*tileSz*psize, # Texture length
+                yl*tileSz*psize) #
+            pygame.draw.rect(win, color, offset_size)
+    return
+
+def draw_texts(win, font, game, win_mrg, frame):
+    """Blit the current turn (or the winners) as text around the frame."""
+    ((xf0,yf0), (xf1,yf1)) = frame
+    ratio = TEXT_RATIO
+    if not game.is_over:
+        (player,direction) = game.current_turn
+        (dsprite,dname) = DIR_DATA_ANY if direction is None else DIR_DATA[direction]
+        # Set window caption
+        pygame.display.set_caption(f"Leaves - Turn {game.current_turn_number+1}")
+        fontcol = ct.mix(ct.WHITE,accent_color(game),2/8)
+        win.blit( # Current player text
+            font.render(f"Player {1+player}",True,fontcol),
+            (win_mrg/ratio,win_mrg*1/ratio))
+        win.blit( # Current direction text
+            font.render(f"Direction: {dsprite} {dname}",True,fontcol),
+            (win_mrg/ratio,win_mrg*2/ratio))
+        win.blit( # Pieces per player left text
+            font.render(f"Pieces left: {', '.join(f'Player {1+player} = {remaining}' for (player,remaining) in enumerate(game.remaining_pieces))}",True,fontcol),
+            (win_mrg/ratio,yf1+win_mrg*3/ratio))
+    # Game over - name winners:
+    else:
+        # Set window caption
+        pygame.display.set_caption(f"Leaves - Game Over!")
+        winners = game.compute_winners()
+        # Unique winner:
+        if len(winners) == 1:
+            winnercol = PIECE_DATA[winners[0]][2][0][2]
+            text_winners = f"Player {1+winners[0]} wins!"
+        # Draw between several players:
+        else:
+            winnercol = ct.LIGHT_GRAY
+            text_winners = f"It's a Draw between {', '.join(f'Player {1+winner}' for winner in winners)}!"
+        fontcol = ct.mix(ct.WHITE,winnercol,7/8)
+        win.blit(
+            font.render(text_winners,True,fontcol),
+            (win_mrg/ratio,win_mrg/ratio))
+    return
+
+@instrumented('pygame.blit')
+def blit(win, font, game, win_mrg, frame):
+    """Blit the texts onto the window and update the display."""
+    draw_texts(win, font, game, win_mrg, frame)
+    # Update display and restart loop
+    pygame.display.update()
+    return
+
+def draw_frame(win, font, game, selection=(None,None), show_pruned=False):
+    """Draw a whole frame of a game onto a surface (without updating the display), e.g. for headless rendering."""
+    (win_mrg,frame) = layout(win.get_size(), game.current_board_size)
+    draw_board(win, game, frame, selection, show_pruned)
+    draw_texts(win, font, game, win_mrg, frame)
+    return
+
 def run(game):
     pygame.init()
     win = pygame.display.set_mode((1280, 720), pygame.RESIZABLE) # Main window
@@ -43,40 +218,9 @@ def run(game):
     while running:
         pygame.time.wait(32) # 32ms = 31.25fps
 
-        # Process input
-        events = set() # List of events to be used later
-        keys   = set() # List of pressed keys
-        mods   = set() # List of pressed key modifiers
-        for event in pygame.event.get():
-            # Add to sensed key presses
-            if event.type == pygame.KEYDOWN:
-                keys.add(event.key)
-            else:
-                events.add(event.type)
-        flags_set = pygame.key.get_mods()
-        for flag in [pygame.KMOD_CTRL,pygame.KMOD_SHIFT,pygame.KMOD_ALT]:
-            # Add to sense key modifiers
-            if flag & flags_set:
-                mods.add(flag)
-
-        # Figure out basic margin for board drawing
-        # -> "(x|y)m(0|1)" are the (row|column) margin (start|end) coordinates
-        (W,H) = pygame.display.get_surface().get_size()
-        (gameW,gameH) = game.current_board_size
-        fraction = 0.70
-        win_mrg = int( min(W,H)/2 * (1-fraction) )
-        ((xm0,ym0), (xm1,ym1)) = ((win_mrg,win_mrg), (W-win_mrg,H-win_mrg))
-
-        # Figure out exact frame within which to draw game
-        # -> "(x|y)f(0|1)" are the (row|column) game board frame (start|end) coordinates
-        # Game board has wider aspect ratio than allowed frame:
-        if ((xm1-xm0)/(ym1-ym0)) <= gameW/gameH:
-            sidemrg = int( ((ym1-ym0) - gameH * (xm1-xm0)/gameW) / 2 )
-            ((xf0,yf0), (xf1,yf1)) = ((xm0,ym0+sidemrg), (xm1,ym1-sidemrg))
-        # Game board has lower aspect ratio than allowed frame:
-        elif ((xm1-xm0)/(ym1-ym0)) > gameW/gameH:
-            sidemrg = int( ((xm1-xm0) - gameW * (ym1-ym0)/gameH) / 2 )
-            ((xf0,yf0), (xf1,yf1)) = ((xm0+sidemrg,ym0), (xm1-sidemrg,ym1))
+        (events,keys,mods) = read_input()
+
+        (win_mrg,frame) = layout(pygame.display.get_surface().get_size(), game.current_board_size)
 
         # Ctrl + r: Reset game
         if pygame.KMOD_CTRL in mods and pygame.K_r in keys:
@@ -92,19 +236,7 @@ def run(game):
             print(f"Turn history:\n---\n{game.current_turn_history}\n---")
 
         # Process mouse
-        (xms,yms) = pygame.mouse.get_pos()
-        # Mouse is on vertical sides:
-        if (xms <= xf0 or xf1 <= xms) and yf0 <= yms <= yf1:
-            sel_line = int((yms-yf0) / (yf1-yf0) * gameH)
-            sel_dir  = Dir.WEST if xms <= xf0 else Dir.EAST
-        # Mouse is on horizontal sides:
-        elif (yms <= yf0 or yf1 <= yms) and xf0 <= xms <= xf1:
-            sel_line = int((xms-xf0) / (xf1-xf0) * gameW)
-            sel_dir  = Dir.NORTH if yms <= yf0 else Dir.SOUTH
-        # Mouse is not selecting a game row or column:
-        else:
-            sel_line = None
-            sel_dir  = None
+        (sel_line,sel_dir) = select_line(pygame.mouse.get_pos(), frame, game.current_board_size)
 
         # Process mouse click
         if pygame.MOUSEBUTTONDOWN in events:
@@ -114,95 +246,12 @@ def run(game):
                 case err:
                     print(f"Whoops: {err}") # TODO make error feedback better?
 
-        # Accent color used
-        accentcol = ct.LIGHT_GRAY if game.is_over else PIECE_DATA[game.current_turn[0]][2][0][2]
-
-        # Draw background
-        bgcol = ct.mix(ct.mix(accentcol,ct.BLACK,6/8),ct.DARK_GRAY,1/8)
-        win.fill(bgcol)
-
-        # Draw debug.
-        """pygame.draw.rect(win, ct.RGB_RED, (xm0-1,ym0-1, 1,1))
-        pygame.draw.rect(win, ct.RGB_GREEN, (xm1,ym0-1, 1,1))
-        pygame.draw.rect(win, ct.RGB_BLUE, (xm0-1,ym1, 1,1))
-        pygame.draw.rect(win, ct.RGB_YELLOW, (xm1,ym1, 1,1))
-        pygame.draw.rect(win, ct.RED, (xf0-2,yf0-2, 2,2))
-        pygame.draw.rect(win, ct.GREEN, (xf1,yf0-2, 2,2))
-        pygame.draw.rect(win, ct.BLUE, (xf0-2,yf1, 2,2))
-        pygame.draw.rect(win, ct.YELLOW, (xf1,yf1, 2,2))"""
-
-        # Draw selected line
-        tileSz = int((xf1-xf0) / gameW) # Available square length (px) per piece
-        barcol1 = ct.mix(bgcol, ct.mix(ct.WHITE,accentcol,2/8), 0.25) # Low pulse
-        barcol2 = ct.mix(bgcol, ct.mix(ct.WHITE,accentcol,2/8), 0.4) # High pulse
-        rate = 2500 # Blinking rate
-        timeparam = pygame.time.get_ticks()%rate/rate
-        barcol = ct.interpolate([barcol1,barcol2,barcol1],timeparam)
-        # Invalid move: Don't select line
-        if not game.check_move(sel_line,sel_dir) == "":
-            pass
-        # Selected column:
-        elif sel_dir in [Dir.NORTH,Dir.SOUTH]:
-            pygame.draw.rect(win, barcol, (xf0+tileSz*sel_line,0, tileSz,H))
-        # Selected row:
-        elif sel_dir in [Dir.EAST,Dir.WEST]:
-            pygame.draw.rect(win, barcol, (0,yf0+tileSz*sel_line, W,tileSz))
-
-        # Draw all board tiles
-        psize = 0.9 # Scaled piece size (so they dont stick to each other directly)
-        pmarg = tileSz*(1-psize)/2 # Resulting piece margin
-        board = game.board.pruned() if show_pruned else game.board
-        for (xp,yp),piecetype in board.pieces.items():
-            (xa,ya) = (xf0 + xp*tileSz, yf0 + yp*tileSz) # Piece (tile) anchor
-            # Draw each of the piece layers
-            for ((xo,yo),(xl,yl),color) in PIECE_DATA[piecetype][2]:
-                offset_size = (
-                    xo*tileSz*psize + pmarg + xa, # Texture offset
-                    xo*tileSz*psize + pmarg + ya, #
-                    xl*tileSz*psize, # Texture length
-                    yl*tileSz*psize) #
-                pygame.draw.rect(win, color, offset_size)
-
-        # Draw texts
-        ratio = 5 # Split remaining vertical space into equal sections
-        if not game.is_over:
-            (player,direction) = game.current_turn
-            (dsprite,dname) = DIR_DATA_ANY if direction is None else DIR_DATA[direction]
-            # Set window caption
-            pygame.display.set_caption(f"Leaves - Turn {game.current_turn_number+1}")
-            # Window resized: Reload (resize) font
-            if pygame.VIDEORESIZE in events:
-                font = pygame.font.SysFont("monospace", round(win_mrg/ratio))
-            fontcol = ct.mix(ct.WHITE,accentcol,2/8)
-            win.blit( # Current player text
-                font.render(f"Player {1+player}",True,fontcol),
-                (win_mrg/ratio,win_mrg*1/ratio))
-            win.blit( # Current direction text
-                font.render(f"Direction: {dsprite} {dname}",True,fontcol),
-                (win_mrg/ratio,win_mrg*2/ratio))
-            win.blit( # Pieces per player left text
-                font.render(f"Pieces left: {', '.join(f'Player {1+player} = {remaining}' for (player,remaining) in enumerate(game.remaining_pieces))}",True,fontcol),
-                (win_mrg/ratio,yf1+win_mrg*3/ratio))
-        # Game over - name winners:
-        else:
-            # Set window caption
-            pygame.display.set_caption(f"Leaves - Game Over!")
-            winners = game.compute_winners()
-            # Unique winner:
-            if len(winners) == 1:
-                winnercol = PIECE_DATA[winners[0]][2][0][2]
-                text_winners = f"Player {1+winners[0]} wins!"
-            # Draw between several players:
-            else:
-                winnercol = ct.LIGHT_GRAY
-                text_winners = f"It's a Draw between {', '.join(f'Player {1+winner}' for winner in winners)}!"
-            fontcol = ct.mix(ct.WHITE,winnercol,7/8)
-            win.blit(
-                font.render(text_winners,True,fontcol),
-                (win_mrg/ratio,win_mrg/ratio))
-
-        # Update display and restart loop
-        pygame.display.update()
+        draw_board(win, game, frame, (sel_line,sel_dir), show_pruned)
+
+        # Window resized: Reload (resize) font
+        if pygame.VIDEORESIZE in events:
+            font = pygame.font.SysFont("monospace", round(win_mrg/TEXT_RATIO))
+        blit(win, font, game, win_mrg, frame)
 
     # Cleanup
     pygame.quit()
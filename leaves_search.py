@@ -0,0 +1,235 @@
+# BEGIN OUTLINE
+"""
+This script contains an alpha-beta search engine to pick moves for a `leaves.Game`.
+
+The search runs negamax with alpha-beta pruning and iterative deepening until
+a wall-clock budget is used up. Positions are cached in a bounded transposition
+table keyed by `leaves.Game.position_key`, and moves are ordered by the table's
+best move first and a history heuristic after that.
+Players do not strictly alternate in Leaves, so the search sees the game as
+the player to find a move for against all other players (paranoid search),
+with the value of a position being that player's score minus the best score
+of any other player.
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+from collections import namedtuple # Search results
+import time # Wall-clock budget
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+INFINITY = 1 << 30
+"""Bound larger than any position value."""
+
+_EXACT, _LOWER, _UPPER = 0, 1, 2 # Kinds of values stored in the transposition table
+
+_TIME_CHECK_INTERVAL = 64 # How many nodes to search between looking at the clock
+
+_SEARCH_TABLE_SIZE_LOG2 = 16 # Size of the table a search allocates for itself (cheap enough to do once per move)
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+SearchResult = namedtuple('SearchResult', ['move', 'value', 'depth', 'nodes', 'seconds', 'nodes_per_second'])
+"""Best move found by a search, its value, the deepest completed search depth and search statistics."""
+
+class _Timeout(Exception):
+    """Raised inside the search once the time budget is used up."""
+
+class TranspositionTable:
+    """Fixed-size table of search results indexed by position key.
+
+    Each position key maps to one slot. A slot is replaced by a deeper search
+    result, or by any result once the slot is left over from an older search.
+    """
+    def __init__(self, size_log2=20):
+        self._mask = (1 << size_log2) - 1
+        self._entries = [None] * (1 << size_log2)
+        self._generation = 0
+
+    def __len__(self):
+        """How many slots are in use."""
+        return sum(1 for entry in self._entries if entry is not None)
+
+    def new_search(self):
+        """Mark all current entries as belonging to an older search."""
+        self._generation += 1
+        return
+
+    def get(self, key):
+        """Return (depth,kind,value,move) stored for a position key, or None."""
+        entry = self._entries[key & self._mask]
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1:5]
+
+    def put(self, key, depth, kind, value, move):
+        """Store a search result for a position key if it is worth more than the one in its slot."""
+        i = key & self._mask
+        entry = self._entries[i]
+        if entry is None or entry[5] != self._generation or depth >= entry[1]:
+            self._entries[i] = (key, depth, kind, value, move, self._generation)
+        return
+
+class _Searcher:
+    """State of a single search run for one player."""
+    def __init__(self, player, table, deadline):
+        self.player = player
+        self.table = table
+        self.deadline = deadline
+        self.nodes = 0
+        self.history = dict()
+        self.salt = ((player + 1) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF # Values depend on whose move we search
+
+    def side(self, game):
+        """+1 if it is the searching player's turn, -1 if any other player's."""
+        return 1 if game.current_turn[0] == self.player else -1
+
+    def evaluate(self, game, side):
+        """Value of a position for a side: searching player's score minus the best other score."""
+        scores = game.scores()
+        own = scores.pop(self.player, 0)
+        return side * (own - max(scores.values(), default=0))
+
+    def ordered_moves(self, game, best_move):
+        """Legal moves, the best known one first and then by history heuristic."""
+        history = self.history
+        moves = sorted(game.legal_moves(), key=lambda move: history.get(move, 0), reverse=True)
+        if best_move in moves:
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+        return moves
+
+    def negamax(self, game, depth, alpha, beta, side):
+        """Value of a position for the side to move, searched to some depth."""
+        self.nodes += 1
+        if self.nodes % _TIME_CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            raise _Timeout
+        if depth == 0 or game.is_over:
+            return self.evaluate(game, side)
+        # Look up earlier results for this position
+        key = game.position_key ^ self.salt
+        alpha_original = alpha
+        best_move = None
+        entry = self.table.get(key)
+        if entry is not None:
+            (entry_depth,kind,value,best_move) = entry
+            if entry_depth >= depth:
+                if kind == _EXACT:
+                    return value
+                elif kind == _LOWER:
+                    alpha = max(alpha, value)
+                elif kind == _UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+        # Search all moves, a child's value only flips sign if the other side moves next
+        best_value = -INFINITY
+        for move in self.ordered_moves(game, best_move):
+            game.apply_move(*move)
+            child_side = side if game.is_over else self.side(game)
+            if child_side == side:
+                value = self.negamax(game, depth-1, alpha, beta, child_side)
+            else:
+                value = -self.negamax(game, depth-1, -beta, -alpha, child_side)
+            game.unmake_move()
+            if value > best_value:
+                (best_value,best_move) = (value,move)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.history[move] = self.history.get(move, 0) + depth*depth
+                break
+        # Remember result for this position
+        if best_value <= alpha_original:
+            kind = _UPPER
+        elif best_value >= beta:
+            kind = _LOWER
+        else:
+            kind = _EXACT
+        self.table.put(key, depth, kind, best_value, best_move)
+        return best_value
+
+    def search_root(self, game, depth, best_move):
+        """Best move and its value at the root, searched to some depth."""
+        (alpha,beta) = (-INFINITY,INFINITY)
+        side = self.side(game)
+        best_value = -INFINITY
+        for move in self.ordered_moves(game, best_move):
+            if time.perf_counter() > self.deadline:
+                raise _Timeout
+            game.apply_move(*move)
+            child_side = side if game.is_over else self.side(game)
+            if child_side == side:
+                value = self.negamax(game, depth-1, alpha, beta, child_side)
+            else:
+                value = -self.negamax(game, depth-1, -beta, -alpha, child_side)
+            game.unmake_move()
+            if value > best_value:
+                (best_value,best_move) = (value,move)
+            alpha = max(alpha, value)
+        self.table.put(game.position_key ^ self.salt, depth, _EXACT, best_value, best_move)
+        return (best_move,best_value)
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def search(game, seconds=1.0, max_depth=None, table=None, tablebase=None, book=None):
+    """Find the best move for the current player of a game within a time budget.
+
+    Searches a copy of the game with iterative deepening until `seconds` have
+    passed or `max_depth` (default: until the game ends) is completed. A
+    `TranspositionTable` can be passed in to be reused across searches (otherwise
+    a small one is allocated, which counts towards the time used), and a
+    `leaves_solver.Tablebase` to play perfectly once it covers the position.
+    While a `leaves_book.Book` has the position, its most played move is
+    returned right away (with value 0).
+    """
+    if game.is_over:
+        raise ValueError("game is over, no moves to search")
+    if tablebase is not None and (solution := tablebase.lookup(game)) is not None:
+        player = game.current_turn[0]
+        others = [score for (other,score) in enumerate(solution.scores) if other != player]
+        return SearchResult(solution.move, solution.scores[player] - max(others, default=0), sum(game.remaining_pieces), 0, 0.0, 0.0)
+    if book is not None and (book_moves := game.book_moves(book)):
+        return SearchResult(book_moves[0].move, 0, 0, 0, 0.0, 0.0)
+    start = time.perf_counter()
+    game = game.clone()
+    if table is None:
+        table = TranspositionTable(_SEARCH_TABLE_SIZE_LOG2)
+    table.new_search()
+    if max_depth is None:
+        max_depth = sum(game.remaining_pieces)
+    searcher = _Searcher(game.current_turn[0], table, start + seconds)
+    (best_move,best_value,best_depth) = (next(game.legal_moves()), None, 0)
+    for depth in range(1, max_depth + 1):
+        try:
+            (best_move,best_value) = searcher.search_root(game, depth, best_move)
+            best_depth = depth
+        except _Timeout:
+            break
+        if time.perf_counter() > searcher.deadline:
+            break
+    seconds = time.perf_counter() - start
+    return SearchResult(best_move, best_value, best_depth, searcher.nodes, seconds, searcher.nodes / seconds if seconds else 0.0)
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+# No main
+# END   MAIN
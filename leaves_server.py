@@ -0,0 +1,424 @@
+# BEGIN OUTLINE
+"""
+This script contains a headless `asyncio` server hosting many `leaves.Game`s over TCP.
+
+Clients send one command per line and receive one JSON object per line:
+    - 'new [log_pieces players pieces_per_player]': start a game and watch it
+    - 'watch GAME' / 'unwatch GAME': get (or stop getting) the state updates of a game
+    - 'move GAME MOVE': make a move in game notation (see `leaves_notation`)
+    - 'bot GAME [PLAYER ...]': let the bot play for some players (default: the current one)
+    - 'quit': close the connection
+Every change of a game is pushed as a 'state' message to all clients watching it,
+errors are answered with an 'error' message.
+
+Each game has its own lock, so commands for one game are applied in order
+while other games go on. Games nobody touched for a while are evicted.
+Outgoing messages go through a bounded queue per client; clients that do not
+read their messages fast enough are disconnected instead of buffering without
+bound. Bots play each game in a background task until it is no longer their
+turn or nobody watches the game anymore. Their moves are searched with
+`leaves_search.search` in an executor (a process pool by default), so they
+never stall the event loop or the client that asked for them.
+
+Usage: python leaves_server.py [--host 127.0.0.1] [--port 8765] [--demo]
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import argparse # Command line interface
+import asyncio # Serving many clients and games at once
+from concurrent.futures import ProcessPoolExecutor # Searching bot moves off the event loop
+import itertools # Game ids
+import json # Messages
+import leaves
+from leaves_consts import PIECE_DATA
+import leaves_notation
+import leaves_search
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+QUEUE_SIZE = 64 # Messages buffered per client before it is considered too slow
+LINE_LIMIT = 4096 # Longest command line accepted
+IDLE_SECONDS = 600.0 # Games untouched for this long are evicted
+MAX_GAMES = 10000 # Games hosted at once
+BOT_SECONDS = 0.5 # Search time per bot move
+MAX_LOG_PIECES = 100 # Largest game configuration clients can start
+MAX_PLAYERS = len(PIECE_DATA) - 1
+MAX_PIECES_PER_PLAYER = 1000
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+class _Match:
+    """A hosted game with its lock, watching clients, bot players and the task making their moves."""
+    def __init__(self, game_id, game, now):
+        self.game_id = game_id
+        self.game = game
+        self.lock = asyncio.Lock()
+        self.watchers = set()
+        self.bots = set()
+        self.bot_task = None
+        self.last_active = now
+
+    def state(self):
+        """Message describing the current state of the game."""
+        game = self.game
+        (player,direction) = (None,None) if game.is_over else game.current_turn
+        scores = game.scores()
+        return {
+            'type': 'state',
+            'game': self.game_id,
+            'turn': game.current_turn_number,
+            'player': player,
+            'direction': None if direction is None else direction.name[0],
+            'remaining_pieces': game.remaining_pieces,
+            'scores': [scores.get(p, 0) for p in range(game.players)],
+            'board': game.board.show(_tile).split('\n'),
+            'history': game.current_turn_history.split(),
+            'is_over': game.is_over,
+            'winners': game.compute_winners(),
+        }
+
+class _Connection:
+    """A connected client with its bounded outgoing message queue."""
+    def __init__(self, writer):
+        self.writer = writer
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.watching = set()
+        self.closed = False
+        self.task = asyncio.create_task(self._write_messages())
+
+    def send(self, message):
+        """Queue a message, dropping the client if it has fallen too far behind."""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.abort()
+        return
+
+    def abort(self):
+        """Close the connection right away, discarding queued messages."""
+        if not self.closed:
+            self.closed = True
+            self.task.cancel()
+            self.writer.close()
+        return
+
+    async def close(self):
+        """Send the queued messages, then close the connection."""
+        if not self.closed:
+            self.closed = True
+            await self.queue.put(None)
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.writer.close()
+        return
+
+    async def _write_messages(self):
+        """Send queued messages, waiting for the socket to drain after each."""
+        try:
+            while (message := await self.queue.get()) is not None:
+                self.writer.write(json.dumps(message).encode() + b'\n')
+                await self.writer.drain()
+        except ConnectionError:
+            self.closed = True
+        return
+
+class GameServer:
+    """Host games for clients connecting over TCP."""
+    def __init__(self, host='127.0.0.1', port=8765, idle_seconds=IDLE_SECONDS, max_games=MAX_GAMES, bot_seconds=BOT_SECONDS, executor=None):
+        self.host = host
+        self.port = port
+        self.idle_seconds = idle_seconds
+        self.max_games = max_games
+        self.bot_seconds = bot_seconds
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._matches = dict()
+        self._ids = itertools.count(1)
+        self._server = None
+        self._evictor = None
+        self._handlers = dict() # Task serving each connection -> connection
+
+    @property
+    def games(self):
+        """How many games are hosted."""
+        return len(self._matches)
+
+    async def start(self):
+        """Start listening (port 0 picks a free port, stored in `port`)."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=LINE_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._evictor = asyncio.create_task(self._evict_idle())
+        return
+
+    async def serve_forever(self):
+        """Start listening and serve until cancelled."""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stop listening and shut down the bot executor."""
+        if self._evictor is not None:
+            self._evictor.cancel()
+        bot_tasks = [match.bot_task for match in self._matches.values() if match.bot_task is not None]
+        for task in bot_tasks:
+            task.cancel()
+        await asyncio.gather(*bot_tasks, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            for connection in self._handlers.values():
+                connection.abort()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+        return
+
+    async def _evict_idle(self):
+        """Periodically drop games nobody touched for `idle_seconds`."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(self.idle_seconds, 60.0) / 2)
+            now = loop.time()
+            for match in [match for match in self._matches.values() if now - match.last_active > self.idle_seconds]:
+                if match.lock.locked():
+                    continue
+                del self._matches[match.game_id]
+                if match.bot_task is not None:
+                    match.bot_task.cancel()
+                for connection in match.watchers:
+                    connection.watching.discard(match.game_id)
+                    connection.send({ 'type': 'evicted', 'game': match.game_id })
+
+    async def _handle(self, reader, writer):
+        """Serve one client connection."""
+        connection = _Connection(writer)
+        self._handlers[asyncio.current_task()] = connection
+        try:
+            while not connection.closed:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError): # Line too long or connection lost
+                    break
+                if not line:
+                    break
+                command = line.decode(errors='replace').split()
+                if not command:
+                    continue
+                if command[0] == 'quit':
+                    break
+                try:
+                    await self._command(connection, command)
+                except ValueError as e:
+                    connection.send({ 'type': 'error', 'message': str(e) })
+        finally:
+            for game_id in connection.watching:
+                if game_id in self._matches:
+                    self._matches[game_id].watchers.discard(connection)
+            await connection.close()
+            del self._handlers[asyncio.current_task()]
+
+    async def _command(self, connection, command):
+        """Carry out one command of a client."""
+        (name,*args) = command
+        if name == 'new':
+            if len(self._matches) >= self.max_games:
+                raise ValueError("server is full, no new games")
+            try:
+                config = [int(arg) for arg in args[:3]]
+            except ValueError:
+                raise ValueError("usage: new [log_pieces players pieces_per_player]") from None
+            for (value,maximum,name) in zip(config, (MAX_LOG_PIECES, MAX_PLAYERS, MAX_PIECES_PER_PLAYER),
+                                            ('log_pieces', 'players', 'pieces_per_player')):
+                if not (1 <= value <= maximum):
+                    raise ValueError(f"{name} must be in range 1 to {maximum}")
+            game = leaves.Game(*config)
+            match = _Match(next(self._ids), game, asyncio.get_running_loop().time())
+            self._matches[match.game_id] = match
+            self._watch(connection, match)
+        elif name == 'watch' and len(args) == 1:
+            self._watch(connection, self._match(args[0]))
+        elif name == 'unwatch' and len(args) == 1:
+            match = self._match(args[0])
+            match.watchers.discard(connection)
+            connection.watching.discard(match.game_id)
+        elif name == 'move' and len(args) == 2:
+            match = self._match(args[0])
+            async with match.lock:
+                game = match.game
+                if game.is_over:
+                    raise ValueError("game is over, no moves allowed")
+                if game.current_turn[0] in match.bots:
+                    raise ValueError("it is the bot's turn")
+                (offset,new_direction) = leaves_notation.parse_move(args[1], game.current_turn[1])
+                err = game.check_move(offset, new_direction)
+                if err:
+                    raise ValueError(err)
+                game.apply_move(offset, new_direction)
+                self._update(match)
+                self._start_bots(match)
+        elif name == 'bot' and len(args) >= 1:
+            match = self._match(args[0])
+            async with match.lock:
+                if match.game.is_over:
+                    raise ValueError("game is over")
+                try:
+                    players = [int(player) - 1 for player in args[1:]] or [match.game.current_turn[0]]
+                except ValueError:
+                    raise ValueError("usage: bot GAME [PLAYER ...]") from None
+                if not all(0 <= player < match.game.players for player in players):
+                    raise ValueError(f"players must be in range 1 to {match.game.players}")
+                match.bots.update(players)
+                self._start_bots(match)
+        else:
+            raise ValueError(f"unknown command {' '.join(command)!r}")
+        return
+
+    def _match(self, game_id):
+        """Find a hosted game by id."""
+        try:
+            return self._matches[int(game_id)]
+        except (ValueError, KeyError):
+            raise ValueError(f"no game {game_id}") from None
+
+    def _watch(self, connection, match):
+        """Subscribe a client to the state updates of a game and send it the current state."""
+        match.watchers.add(connection)
+        connection.watching.add(match.game_id)
+        connection.send(match.state())
+        self._start_bots(match)
+        return
+
+    def _update(self, match):
+        """Push the state of a game to everyone watching it."""
+        match.last_active = asyncio.get_running_loop().time()
+        state = match.state()
+        for connection in list(match.watchers):
+            connection.send(state)
+            if connection.closed:
+                match.watchers.discard(connection)
+        return
+
+    def _start_bots(self, match):
+        """Let the bots of a game play in the background, unless they already do."""
+        if match.bot_task is None or match.bot_task.done():
+            match.bot_task = asyncio.create_task(self._play_bots(match))
+        return
+
+    async def _play_bots(self, match):
+        """Make moves for bot players while it is their turn and anyone is watching the game."""
+        loop = asyncio.get_running_loop()
+        game = match.game
+        # Only bots move on their turns (clients' moves are refused), so the game cannot change while searching
+        while not game.is_over and game.current_turn[0] in match.bots and match.watchers:
+            result = await loop.run_in_executor(self._executor, leaves_search.search, game.clone(), self.bot_seconds)
+            async with match.lock:
+                game.apply_move(*result.move)
+                self._update(match)
+        return
+
+class Client:
+    """Minimal client to talk to a `GameServer`, e.g. for testing."""
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765):
+        """Open a connection to a server."""
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def send(self, command):
+        """Send a command line."""
+        self._writer.write(command.encode() + b'\n')
+        await self._writer.drain()
+        return
+
+    async def receive(self):
+        """Wait for the next message, None if the server closed the connection."""
+        line = await self._reader.readline()
+        return json.loads(line) if line else None
+
+    async def close(self):
+        """Close the connection."""
+        self._writer.close()
+        await self._writer.wait_closed()
+        return
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def _tile(piece):
+    """Character of a board tile in state messages."""
+    return '.' if piece is None else '#' if piece == -1 else str(piece + 1)
+
+async def _demo(server):
+    """Play a local client against the bot, printing the messages received."""
+    await server.start()
+    client = await Client.connect(server.host, server.port)
+    await client.send('new 3 2 4')
+    state = await client.receive()
+    game_id = state['game']
+    await client.send(f'bot {game_id} 2')
+    while not state['is_over']:
+        if state['player'] == 0:
+            direction = state['direction']
+            move = '1' if direction else 'N1'
+            await client.send(f'move {game_id} {move}')
+        state = await client.receive()
+        if state['type'] == 'error':
+            print(state)
+            break
+        print(f"turn {state['turn']}: {' '.join(state['history'][-1:])}")
+    print('\n'.join(state['board']))
+    print(f"scores: {state['scores']}, winners: {state['winners']}")
+    await client.close()
+    await server.close()
+    return
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+
+def main():
+    parser = argparse.ArgumentParser(description="Host Leaves games over TCP.")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on (0 for any free port)")
+    parser.add_argument('--bot-seconds', type=float, default=BOT_SECONDS, help="search time per bot move")
+    parser.add_argument('--demo', action='store_true', help="play a local client against the bot and exit")
+    args = parser.parse_args()
+    server = GameServer(args.host, 0 if args.demo else args.port, bot_seconds=args.bot_seconds)
+    try:
+        asyncio.run(_demo(server) if args.demo else server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return
+
+if __name__=="__main__": main()
+
+# END   MAIN
@@ -0,0 +1,185 @@
+# BEGIN OUTLINE
+"""
+This script contains an exact solver and on-disk tablebases for small `leaves.Game` configurations.
+
+The solver enumerates the whole game tree and finds the final scores of every
+reachable position under perfect play, where every player picks the move that
+maximizes their own score minus the best score of any other player (for two
+players this is plain minimax). Positions equal up to rotation are solved once
+by keying them with `leaves.Game.canonical_key`.
+Tablebases store the results for all positions with at most some number of
+pieces left to play, in an open-addressing hash table on disk (laid out by
+`leaves_table`) that is read through `mmap`, so lookups take constant time.
+
+File layout (all integers little-endian):
+    - Header: magic b'LVTB', format version (u16), log_pieces (u16), players (u16),
+      pieces_per_player (u16), max_remaining (u16), number of slots (u64, a power of two),
+      number of positions (u64)
+    - Slots: canonical key (u64, 0 for an empty slot), best move in the canonical
+      rotation (u8, `direction << 6 | offset`, 255 when the game is over),
+      and the final score of each player (u8 each)
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+from collections import namedtuple # Lookup results
+import mmap # Constant time lookups into tablebase files
+import struct # Packing headers and slots
+import leaves
+import leaves_table
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+MAGIC = b'LVTB'
+"""Bytes every tablebase file starts with."""
+
+VERSION = 2
+"""Version of the tablebase format written."""
+
+_HEADER = struct.Struct('<4sHHHHHQQ')
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+Solution = namedtuple('Solution', ['move', 'scores'])
+"""Best move of a position (None if the game is over) and the final score of each player under perfect play."""
+
+class Solver:
+    """Solve positions of a game configuration exactly, remembering every solved position."""
+    def __init__(self):
+        self.solutions = dict() # Canonical key -> (move in canonical rotation, final scores, pieces left)
+
+    def solve(self, game):
+        """Return the `Solution` of a position (the game is left unchanged)."""
+        (move,scores,_) = self._solve(game)
+        if move is not None:
+            move = game.from_canonical_move(move)
+        return Solution(move, scores)
+
+    def _solve(self, game):
+        keys = game.symmetric_keys()
+        key = min(keys)
+        if key in self.solutions:
+            return self.solutions[key]
+        if game.is_over:
+            scores = game.scores()
+            solution = (None, tuple(scores.get(player, 0) for player in range(game.players)), 0)
+        else:
+            player = game.current_turn[0]
+            (best_move,best_scores,best_utility) = (None, None, None)
+            for move in list(game.legal_moves()):
+                game.apply_move(*move)
+                (_,scores,_) = self._solve(game)
+                game.unmake_move()
+                utility = scores[player] - max((score for (other,score) in enumerate(scores) if other != player), default=0)
+                if best_utility is None or utility > best_utility:
+                    (best_move,best_scores,best_utility) = (move,scores,utility)
+            rotation = keys.index(key)
+            solution = (leaves.rotate_move(best_move, rotation, game.current_board_size), best_scores, sum(game.remaining_pieces))
+        self.solutions[key] = solution
+        return solution
+
+class Tablebase:
+    """Read-only constant time lookups into a tablebase file, to be used as context manager (or closed explicitly)."""
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic,version,log_pieces,players,pieces_per_player,max_remaining,slots,positions) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} leaves tablebase")
+        self._config = (log_pieces, players, pieces_per_player)
+        self._max_remaining = max_remaining
+        self._slot = struct.Struct(f'<QB{players}B')
+        self._slots = slots
+        self._positions = positions
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Release the memory map of the file."""
+        self._map.close()
+        return
+
+    @property
+    def config(self):
+        """(log_pieces,players,pieces_per_player) of the games in the tablebase."""
+        return self._config
+
+    @property
+    def max_remaining(self):
+        """Positions with at most this many pieces left to play (in total) are in the tablebase."""
+        return self._max_remaining
+
+    def __len__(self):
+        """How many positions are stored."""
+        return self._positions
+
+    def covers(self, game):
+        """Whether a game of this configuration has few enough pieces left to be in the tablebase."""
+        return ((game.log_pieces, game.players, game.pieces_per_player) == self._config
+                and sum(game.remaining_pieces) <= self._max_remaining)
+
+    def lookup(self, game):
+        """Return the `Solution` of a position, or None if it is not in the tablebase."""
+        if not self.covers(game):
+            return None
+        keys = game.symmetric_keys()
+        key = min(keys)
+        values = leaves_table.probe(self._map, _HEADER.size, self._slot, self._slots, key)
+        if values is None:
+            return None
+        (move,*scores) = values
+        move = leaves_table.unpack_move(move)
+        if move is None:
+            return Solution(None, tuple(scores))
+        return Solution(game.from_canonical_move(move, keys.index(key)), tuple(scores))
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def build_tablebase(path, log_pieces=3, players=2, pieces_per_player=3, max_remaining=None):
+    """Solve a game configuration and write all reachable positions with at most `max_remaining` pieces left (default: all) to a tablebase file.
+
+    Returns the number of positions written.
+    """
+    game = leaves.Game(log_pieces, players, pieces_per_player)
+    if max_remaining is None:
+        max_remaining = players * pieces_per_player
+    solver = Solver()
+    solver.solve(game)
+    # The solver visited every reachable position, only keep those with few enough pieces left
+    entries = [ (key,move,scores)
+                for (key,(move,scores,remaining)) in solver.solutions.items()
+                if remaining <= max_remaining ]
+    slot = struct.Struct(f'<QB{players}B')
+    table = leaves_table.build_table(slot, ((key, leaves_table.pack_move(move), *scores) for (key,move,scores) in entries))
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, log_pieces, players, pieces_per_player, max_remaining, leaves_table.table_slots(len(entries)), len(entries)))
+        file.write(table)
+    return len(entries)
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+# No main
+# END   MAIN
@@ -0,0 +1,96 @@
+# BEGIN OUTLINE
+"""
+This script contains the on-disk hash tables and packed moves shared by `leaves_solver` and `leaves_book`.
+
+Tables are open-addressing hash tables of fixed-size slots, each starting with
+a position key (u64, little-endian). Their number of slots is a power of two
+at least twice the number of entries, the slot of a key is found by linear
+probing from `key & (slots - 1)`, and a key of 0 marks an empty slot.
+Moves are packed into one byte as `direction << 6 | offset`, with the value
+`NO_MOVE` kept free to stand for no move at all.
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+from leaves import Dir
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+NO_MOVE = 255
+"""Packed value standing for no move (e.g. for finished games)."""
+
+MAX_OFFSET = 62
+"""Largest line offset a packed move can have (offset 63 west would be `NO_MOVE`)."""
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+# No classes
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def pack_move(move):
+    """Pack an (offset,direction) move, or None, into one byte."""
+    if move is None:
+        return NO_MOVE
+    (offset,direction) = move
+    if not (0 <= offset <= MAX_OFFSET):
+        raise ValueError(f"move offsets must be in range 0 to {MAX_OFFSET} to be stored, not {offset}")
+    return direction.value << 6 | offset
+
+def unpack_move(byte):
+    """Unpack an (offset,direction) move, or None, from one byte."""
+    return None if byte == NO_MOVE else (byte & 63, Dir(byte >> 6))
+
+def table_slots(entries):
+    """Number of slots of a table holding some number of entries."""
+    slots = 1
+    while slots < 2 * entries:
+        slots *= 2
+    return slots
+
+def build_table(slot, entries):
+    """Lay out a table of (key, *values) entries packed with a `struct.Struct` slot format, returning its bytes."""
+    entries = list(entries)
+    mask = table_slots(len(entries)) - 1
+    table = bytearray((mask + 1) * slot.size)
+    for entry in entries:
+        if entry[0] == 0:
+            raise ValueError("key 0 marks empty slots and cannot be stored")
+        i = entry[0] & mask
+        while int.from_bytes(table[i*slot.size : i*slot.size + 8], 'little') != 0:
+            i = (i + 1) & mask
+        slot.pack_into(table, i*slot.size, *entry)
+    return table
+
+def probe(buffer, position, slot, slots, key):
+    """Find the values stored for a key in a table starting at some position of a buffer, or None if it has none."""
+    mask = slots - 1
+    i = key & mask
+    while True:
+        (slot_key,*values) = slot.unpack_from(buffer, position + i*slot.size)
+        if slot_key == key:
+            return values
+        if slot_key == 0:
+            return None
+        i = (i + 1) & mask
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+# No main
+# END   MAIN
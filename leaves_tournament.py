@@ -0,0 +1,216 @@
+# BEGIN OUTLINE
+"""
+This script runs tournaments between move-selection policies for `leaves.Game`s.
+
+A policy is a function (game, rng) -> (offset,direction), registered by name in
+`POLICIES`. Every group of policies plays every seat rotation in each game
+configuration, for some number of rounds. Matches run on a process pool, and
+their results are streamed to a JSON lines file as they finish while the Elo
+ratings are updated (games with more than two players count as all pairwise
+results between their seats).
+
+Policies registered at runtime are only known to worker processes started by
+forking (the default on Linux); elsewhere register them in an imported module.
+
+Usage: python leaves_tournament.py [--policies random greedy search] [--configs 5,2,10 3,3,6] [--rounds 10] [--out results.jsonl] [--workers N] [--seed 0]
+"""
+# END   OUTLINE
+
+
+# BEGIN IMPORTS
+
+import argparse # Command line interface
+from concurrent.futures import ProcessPoolExecutor,as_completed # Running matches in parallel
+import itertools # Pairings and seat rotations
+import json # Streaming results
+import random # Seeded policies
+import leaves
+import leaves_mcts
+import leaves_search
+
+# END   IMPORTS
+
+
+# BEGIN CONSTANTS
+
+SEARCH_DEPTH = 2 # Depth of the 'search' policy
+SEARCH_SECONDS = 0.1 # Time limit of the 'search' policy
+MCTS_PLAYOUTS = 200 # Playouts of the 'mcts' policy
+
+# END   CONSTANTS
+
+
+# BEGIN DECORATORS
+# No decorators
+# END   DECORATORS
+
+
+# BEGIN CLASSES
+
+class Elo:
+    """Elo ratings of policies, updated one match at a time."""
+    def __init__(self, k=16.0, initial=1500.0):
+        self.k = k
+        self.initial = initial
+        self.ratings = dict()
+        self.games = dict()
+        self.wins = dict()
+
+    def expected(self, a, b):
+        """Expected score of policy a against policy b."""
+        (ra,rb) = (self.ratings.get(a, self.initial), self.ratings.get(b, self.initial))
+        return 1 / (1 + 10 ** ((rb - ra) / 400))
+
+    def update(self, seats, scores, winners):
+        """Update the ratings with the final scores of a match between the policies in some seats."""
+        k = self.k / max(1, len(seats) - 1)
+        deltas = [0.0] * len(seats)
+        for (i,j) in itertools.combinations(range(len(seats)), 2):
+            if seats[i] == seats[j]:
+                continue
+            outcome = 1.0 if scores[i] > scores[j] else 0.0 if scores[i] < scores[j] else 0.5
+            change = k * (outcome - self.expected(seats[i], seats[j]))
+            deltas[i] += change
+            deltas[j] -= change
+        for (name,delta) in zip(seats, deltas):
+            self.ratings[name] = self.ratings.get(name, self.initial) + delta
+        # A policy in several seats still played and won the match only once, draws are shared between policies
+        winning = { seats[seat] for seat in winners }
+        for name in set(seats):
+            self.games[name] = self.games.get(name, 0) + 1
+            self.wins[name] = self.wins.get(name, 0) + (name in winning) / len(winning)
+        return
+
+    def standings(self):
+        """Return (name,rating,games,wins) of every policy, best rating first."""
+        return sorted(((name, rating, self.games[name], self.wins[name])
+                       for (name,rating) in self.ratings.items()), key=lambda standing: -standing[1])
+
+# END   CLASSES
+
+
+# BEGIN FUNCTIONS
+
+def random_policy(game, rng):
+    """Play any legal move."""
+    return rng.choice(list(game.legal_moves()))
+
+def greedy_policy(game, rng):
+    """Play a move maximizing own score minus the best other score right after it."""
+    player = game.current_turn[0]
+    (best_moves,best_value) = ([], None)
+    for move in list(game.legal_moves()):
+        game.apply_move(*move)
+        scores = game.scores()
+        game.unmake_move()
+        value = scores.get(player, 0) - max((score for (other,score) in scores.items() if other != player), default=0)
+        if best_value is None or value > best_value:
+            (best_moves,best_value) = ([move], value)
+        elif value == best_value:
+            best_moves.append(move)
+    return rng.choice(best_moves)
+
+def search_policy(game, rng):
+    """Play the move of a shallow `leaves_search.search`."""
+    return leaves_search.search(game, seconds=SEARCH_SECONDS, max_depth=SEARCH_DEPTH).move
+
+def mcts_policy(game, rng):
+    """Play the move of a small single-process `leaves_mcts.mcts`."""
+    return leaves_mcts.mcts(game, playouts=MCTS_PLAYOUTS, workers=1, seed=rng.getrandbits(64)).move
+
+POLICIES = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+    'search': search_policy,
+    'mcts': mcts_policy,
+}
+"""Move-selection policies by name."""
+
+def register(name, policy):
+    """Make a policy (game, rng) -> move available to tournaments under some name."""
+    POLICIES[name] = policy
+    return
+
+def play_match(config, seats, seed):
+    """Play one game with a policy (by name) in each seat, returning the result as dict."""
+    rng = random.Random(seed)
+    game = leaves.Game(*config)
+    policies = [POLICIES[name] for name in seats]
+    while not game.is_over:
+        move = policies[game.current_turn[0]](game, rng)
+        game.make_move(*move)
+    scores = game.scores()
+    return {
+        'config': list(config),
+        'seats': list(seats),
+        'seed': seed,
+        'scores': [scores.get(player, 0) for player in range(game.players)],
+        'winners': game.compute_winners(),
+        'moves': game.current_turn_history.split(),
+    }
+
+def schedule(policies, configs, rounds=1, seed=0):
+    """Generate (config,seats,seed) of the matches of a tournament.
+
+    For each configuration, every group of `players` policies (repeating
+    policies if there are fewer than seats) plays every rotation of its seats.
+    """
+    rng = random.Random(seed)
+    for _ in range(rounds):
+        for config in configs:
+            players = config[1]
+            if len(policies) >= players:
+                groups = itertools.combinations(policies, players)
+            else:
+                groups = (group for group in itertools.combinations_with_replacement(policies, players) if len(set(group)) > 1)
+            for group in groups:
+                for rotation in range(players):
+                    yield (tuple(config), group[rotation:] + group[:rotation], rng.getrandbits(64))
+
+def run_tournament(policies, configs, rounds=1, out=None, workers=None, seed=0, elo=None):
+    """Play all matches of a tournament on a process pool, returning the `Elo` ratings.
+
+    Each result is written as one JSON line to `out` (a path or open text file)
+    as soon as its match finishes, along with the ratings after it.
+    """
+    if isinstance(out, str):
+        with open(out, 'w') as file:
+            return run_tournament(policies, configs, rounds, file, workers, seed, elo)
+    if elo is None:
+        elo = Elo()
+    matches = list(schedule(policies, configs, rounds, seed))
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(play_match, *match) for match in matches]
+        for future in as_completed(futures):
+            result = future.result()
+            elo.update(result['seats'], result['scores'], result['winners'])
+            if out is not None:
+                result['ratings'] = { name:round(elo.ratings[name], 1) for name in result['seats'] }
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+    return elo
+
+# END   FUNCTIONS
+
+
+# BEGIN MAIN
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a tournament between Leaves policies.")
+    parser.add_argument('--policies', nargs='+', default=['random', 'greedy', 'search'], choices=list(POLICIES), help="policies taking part")
+    parser.add_argument('--configs', nargs='+', default=['5,2,10'], help="game configurations as log_pieces,players,pieces_per_player")
+    parser.add_argument('--rounds', type=int, default=10, help="how often every pairing is played")
+    parser.add_argument('--out', help="JSON lines file to stream results to")
+    parser.add_argument('--workers', type=int, help="processes to play matches on (default: one per core)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the matches")
+    args = parser.parse_args()
+    configs = [tuple(int(n) for n in config.split(',')) for config in args.configs]
+    elo = run_tournament(args.policies, configs, args.rounds, args.out, args.workers, args.seed)
+    print(f"{'policy':<10}{'rating':>8}{'games':>8}{'wins':>8}")
+    for (name,rating,games,wins) in elo.standings():
+        print(f"{name:<10}{rating:>8.1f}{games:>8}{wins:>8.1f}")
+    return
+
+if __name__=="__main__": main()
+
+# END   MAIN
@@ -1,21 +1,26 @@
 # BEGIN OUTLINE
 """
 This script allows trying the game on the command line and then with pygame.
+
+Usage: python main.py [--logs 5] [--players 2] [--pieces 10] [--interface both|console|pygame]
 """
 # END   OUTLINE
 
 
 # BEGIN IMPORTS
 
+import argparse # Choosing the game configuration
 import leaves
 import leaves_console
-import leaves_pygame
+from leaves_consts import PIECE_DATA
 
 # END   IMPORTS
 
 
 # BEGIN CONSTANTS
-# No constants
+
+MAX_PLAYERS = len(PIECE_DATA) - 1 # Players there is piece data for (besides logs)
+
 # END   CONSTANTS
 
 
@@ -37,10 +42,24 @@ import leaves_pygame
 # BEGIN MAIN
 
 def main():
-    #game = LeavesGame()
-    game = leaves.Game(log_pieces=5, players=2, pieces_per_player=10)
-    leaves_console.run(game)
-    leaves_pygame.run(game)
+    parser = argparse.ArgumentParser(description="Play a game of Leaves.")
+    parser.add_argument('--logs', type=int, default=5, help="log pieces on the board at the start")
+    parser.add_argument('--players', type=int, default=2, help=f"number of players (1 to {MAX_PLAYERS})")
+    parser.add_argument('--pieces', type=int, default=10, help="pieces each player gets")
+    parser.add_argument('--interface', default='both', choices=['both', 'console', 'pygame'], help="where to play (console first, then pygame for 'both')")
+    args = parser.parse_args()
+    if args.logs < 1:
+        parser.error("--logs must be at least 1")
+    if not (1 <= args.players <= MAX_PLAYERS):
+        parser.error(f"--players must be in range 1 to {MAX_PLAYERS}")
+    if args.pieces < 1:
+        parser.error("--pieces must be at least 1")
+    game = leaves.Game(log_pieces=args.logs, players=args.players, pieces_per_player=args.pieces)
+    if args.interface in ('both', 'console'):
+        leaves_console.run(game)
+    if args.interface in ('both', 'pygame'):
+        import leaves_pygame # Only needed (and installed) for the pygame interface
+        leaves_pygame.run(game)
     return
 
 if __name__=="__main__": main()